@@ -0,0 +1,114 @@
+"""
+Адаптивный размер пакета для Google Indexing API
+
+Размер следующего пакета подбирается по принципу AIMD (как окно TCP):
+  - при временных ошибках (429/5xx, сетевые сбои) в текущем пакете он уменьшается вдвое;
+  - при росте задержки выше целевой пакет уменьшается на четверть;
+  - в здоровом состоянии пакет растет на фиксированный шаг до 100, но пока
+    сглаженная доля ошибок выше порога (ошибки были недавно), рост откладывается.
+Дополнительно размер ограничивается оставшейся квотой.
+
+Постоянные ошибки вроде 403 (нет прав на домен) не зависят от нагрузки,
+поэтому на размер пакета не влияют.
+"""
+
+from typing import Dict, Optional
+
+from indexing_batch import MAX_BATCH_SIZE, RETRYABLE_STATUS_CODES
+
+
+class AdaptiveBatchSizer:
+    """Контроллер размера пакета по задержке, ошибкам и квоте"""
+
+    def __init__(self, initial_size: int = MAX_BATCH_SIZE, min_size: int = 5,
+                 max_size: int = MAX_BATCH_SIZE, increase_step: int = 10,
+                 target_latency: float = 10.0, error_threshold: float = 0.1,
+                 smoothing: float = 0.3, quota: Optional[int] = None):
+        """
+        Args:
+            initial_size: Начальный размер пакета
+            min_size: Минимальный размер пакета
+            max_size: Максимальный размер пакета (не больше 100)
+            increase_step: Шаг увеличения в здоровом состоянии
+            target_latency: Целевое время ответа на пакет в секундах
+            error_threshold: Доля временных ошибок, при которой пакет уменьшается
+            smoothing: Коэффициент экспоненциального сглаживания (0..1)
+            quota: Оставшаяся квота запросов (None - без ограничения)
+        """
+        self.max_size = max(1, min(max_size, MAX_BATCH_SIZE))
+        self.min_size = max(1, min(min_size, self.max_size))
+        self.size = max(self.min_size, min(initial_size, self.max_size))
+        self.increase_step = increase_step
+        self.target_latency = target_latency
+        self.error_threshold = error_threshold
+        self.smoothing = smoothing
+        self.quota_remaining = quota
+
+        self.latency = None
+        self.error_rate = 0.0
+
+    def next_size(self, remaining_urls: int) -> int:
+        """
+        Размер следующего пакета
+
+        Args:
+            remaining_urls: Количество еще не отправленных URL-ов
+
+        Returns:
+            Размер пакета (0, если квота исчерпана)
+        """
+        size = min(self.size, remaining_urls)
+        if self.quota_remaining is not None:
+            size = min(size, self.quota_remaining)
+        return max(0, size)
+
+    def record(self, batch_result: Dict):
+        """
+        Учет результата отправленного пакета
+
+        Args:
+            batch_result: Результат пакета (urls_count, success, status_code,
+                elapsed, url_results)
+        """
+        urls_count = batch_result.get("urls_count", 0)
+        if self.quota_remaining is not None:
+            self.quota_remaining = max(0, self.quota_remaining - urls_count)
+
+        error_rate = _transient_error_rate(batch_result)
+        self.error_rate = self._smooth(self.error_rate, error_rate)
+
+        elapsed = batch_result.get("elapsed")
+        if elapsed is not None:
+            self.latency = elapsed if self.latency is None else self._smooth(self.latency, elapsed)
+
+        # Уменьшаем только по ошибкам текущего пакета: сглаженная доля после
+        # единичного сбоя еще несколько пакетов выше порога и лишь сдерживает рост
+        if error_rate >= self.error_threshold:
+            self.size = max(self.min_size, self.size // 2)
+        elif self.latency is not None and self.latency > self.target_latency:
+            self.size = max(self.min_size, int(self.size * 0.75))
+        elif self.error_rate < self.error_threshold:
+            self.size = min(self.max_size, self.size + self.increase_step)
+
+    def _smooth(self, previous: float, value: float) -> float:
+        """Экспоненциальное сглаживание"""
+        return previous + self.smoothing * (value - previous)
+
+
+def _transient_error_rate(batch_result: Dict) -> float:
+    """Доля временных ошибок в пакете"""
+    url_results = batch_result.get("url_results")
+    if url_results:
+        transient = sum(
+            1 for result in url_results
+            if not result["success"] and (result.get("status_code") is None
+                                          or result["status_code"] in RETRYABLE_STATUS_CODES)
+        )
+        return transient / len(url_results)
+
+    if batch_result.get("success"):
+        return 0.0
+
+    # Пакет не дошел целиком: временная ошибка, если это не отказ в правах/формате
+    status_code = batch_result.get("status_code")
+    return 1.0 if status_code is None or status_code in RETRYABLE_STATUS_CODES else 0.0
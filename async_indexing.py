@@ -0,0 +1,216 @@
+"""
+Асинхронный клиент Google Indexing API для встраивания в сервисы
+
+Клиент ничего не печатает (события пишутся только в логгер "indexing",
+который по умолчанию молчит): результаты возвращаются вызывающему коду, а
+блокирующие операции (разбор ключа, обмен токена, HTTP запрос) выполняются
+в пуле потоков, чтобы не блокировать event loop.
+
+Пример:
+    async with AsyncIndexingClient("service_account.json") as client:
+        summary = await client.submit(urls)
+
+        async for result in client.iter_results(urls):
+            print(result["url"], result["success"])
+"""
+
+import asyncio
+import functools
+import logging
+from concurrent.futures import Executor
+from pathlib import Path
+from typing import AsyncIterator, Dict, List, Optional
+
+import requests
+
+from credentials_provider import get_credentials
+from indexing_batch import (BATCH_ENDPOINT, MAX_BATCH_SIZE, RETRYABLE_STATUS_CODES,
+                            build_batch_request, failed_url_results, parse_batch_response)
+from indexing_logging import LOGGER_NAME, batch_context, new_batch_id
+
+logger = logging.getLogger(LOGGER_NAME)
+
+
+class AsyncIndexingClient:
+    """Асинхронный клиент для работы с Google Indexing API"""
+
+    def __init__(self, service_account_path: str = "service_account.json",
+                 batch_size: int = 100, max_retries: int = 3,
+                 batch_delay: float = 2.0, timeout: float = 30,
+                 executor: Optional[Executor] = None):
+        """
+        Инициализация клиента
+
+        Args:
+            service_account_path: Путь к файлу service_account.json
+            batch_size: Размер пакета (максимум 100)
+            max_retries: Максимальное количество попыток для пакета
+            batch_delay: Пауза между пакетами в секундах
+            timeout: Таймаут HTTP запроса в секундах
+            executor: Пул потоков для блокирующих операций (по умолчанию пул event loop)
+        """
+        self.service_account_path = Path(service_account_path)
+        if not self.service_account_path.exists():
+            raise FileNotFoundError(f"Файл {service_account_path} не найден!")
+
+        self.batch_size = max(1, min(batch_size, MAX_BATCH_SIZE))
+        self.max_retries = max(1, max_retries)
+        self.batch_delay = batch_delay
+        self.timeout = timeout
+        self.credentials = None
+
+        self._executor = executor
+        self._session = requests.Session()
+        self._auth_lock = None
+
+    async def __aenter__(self) -> "AsyncIndexingClient":
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def close(self):
+        """Закрытие HTTP сессии"""
+        await self._run(self._session.close)
+
+    @property
+    def service_account_email(self) -> Optional[str]:
+        """Email сервисного аккаунта (доступен после первой аутентификации)"""
+        return self.credentials.service_account_email if self.credentials else None
+
+    async def submit(self, urls: List[str]) -> Dict:
+        """
+        Отправка URL-ов с ожиданием всех результатов
+
+        Args:
+            urls: Список URL-ов для отправки
+
+        Returns:
+            Словарь с итогами и результатами по каждому URL-у
+        """
+        summary = {
+            "total_urls": len(urls),
+            "success_count": 0,
+            "error_count": 0,
+            "results": []
+        }
+
+        async for result in self.iter_results(urls):
+            summary["results"].append(result)
+            if result["success"]:
+                summary["success_count"] += 1
+            else:
+                summary["error_count"] += 1
+
+        return summary
+
+    async def iter_results(self, urls: List[str]) -> AsyncIterator[Dict]:
+        """
+        Отправка URL-ов с выдачей результата по каждому URL-у по мере готовности пакетов
+
+        Args:
+            urls: Список URL-ов для отправки
+
+        Yields:
+            Результат для одного URL-а (url, success, status_code, error/response)
+        """
+        for start in range(0, len(urls), self.batch_size):
+            if start:
+                await asyncio.sleep(self.batch_delay)
+
+            batch = urls[start:start + self.batch_size]
+            with batch_context(new_batch_id()):
+                batch_result = await self._submit_batch_with_retry(batch)
+                logger.info(
+                    "Пакет отправлен" if batch_result["success"] else "Ошибка отправки пакета",
+                    extra={"urls_count": len(batch), "status_code": batch_result.get("status_code")}
+                )
+
+            for result in batch_result.get("url_results") or failed_url_results(batch, batch_result):
+                yield result
+
+    async def _run(self, func, *args, **kwargs):
+        """Выполнение блокирующей функции в пуле потоков"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+
+    async def _get_access_token(self) -> str:
+        """Получение действующего токена с обновлением при необходимости"""
+        if self._auth_lock is None:
+            self._auth_lock = asyncio.Lock()
+
+        # Кэш процесса общий с синхронным клиентом; в пул потоков уходим
+        # только когда токена нет или он истек
+        async with self._auth_lock:
+            if self.credentials is None or not self.credentials.valid:
+                self.credentials = await self._run(get_credentials, str(self.service_account_path))
+
+        return self.credentials.token
+
+    async def _submit_batch_with_retry(self, urls: List[str]) -> Dict:
+        """
+        Отправка пакета с повторными попытками при сетевых ошибках, 429 и 5xx
+
+        Args:
+            urls: Список URL-ов для пакета
+
+        Returns:
+            Результат отправки пакета
+        """
+        result = {}
+        for attempt in range(self.max_retries):
+            try:
+                result = await self._submit_batch(urls)
+            except Exception as e:
+                result = {
+                    "success": False,
+                    "urls_count": len(urls),
+                    "error": f"Ошибка в попытке {attempt + 1}: {e}"
+                }
+                logger.warning(result["error"])
+            else:
+                if result["success"] or result.get("status_code") not in RETRYABLE_STATUS_CODES:
+                    return result
+
+            if attempt < self.max_retries - 1:
+                await asyncio.sleep(5 * (attempt + 1))
+
+        return result
+
+    async def _submit_batch(self, urls: List[str]) -> Dict:
+        """
+        Отправка одного пакета URL-ов
+
+        Args:
+            urls: Список URL-ов для пакета
+
+        Returns:
+            Результат отправки пакета
+        """
+        access_token = await self._get_access_token()
+        headers, body = build_batch_request(urls, access_token)
+
+        response = await self._run(
+            self._session.post,
+            BATCH_ENDPOINT,
+            headers=headers,
+            data=body,
+            timeout=self.timeout
+        )
+
+        if response.status_code != 200:
+            return {
+                "success": False,
+                "urls_count": len(urls),
+                "error": f"HTTP {response.status_code}: {response.text}",
+                "status_code": response.status_code
+            }
+
+        return {
+            "success": True,
+            "urls_count": len(urls),
+            "status_code": response.status_code,
+            "url_results": parse_batch_response(
+                urls, response.headers.get('Content-Type', ''), response.text
+            )
+        }
@@ -0,0 +1,255 @@
+"""
+Обнаружение изменений страниц перед отправкой в Google Indexing API
+
+Перед публикацией для каждого URL-а определяется, изменилось ли содержимое с
+момента последней успешной отправки. Источники информации (по приоритету):
+  1. content_hash / etag / last_modified, переданные вместе с URL-ом;
+  2. условный GET запрос (If-None-Match / If-Modified-Since) к самой странице,
+     при ответе 200 сравнивается SHA-256 содержимого.
+
+Состояние хранится в локальной SQLite базе и обновляется только для URL-ов,
+которые были успешно опубликованы, поэтому неудачная отправка повторится
+при следующем запуске. У неизменившихся страниц обновляются только ETag и
+Last-Modified, чтобы следующий условный запрос получил 304.
+"""
+
+import hashlib
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+import requests
+
+DEFAULT_HASH_STORE = "content_hashes.db"
+_STATE_FIELDS = ("etag", "last_modified", "content_hash")
+
+
+class HashStore:
+    """Локальное хранилище состояния опубликованных URL-ов"""
+
+    def __init__(self, path: str = DEFAULT_HASH_STORE):
+        """
+        Args:
+            path: Путь к файлу SQLite базы
+        """
+        self.path = path
+        self._conn = sqlite3.connect(path)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS url_state ("
+            " url TEXT PRIMARY KEY,"
+            " etag TEXT,"
+            " last_modified TEXT,"
+            " content_hash TEXT,"
+            " published_at TEXT)"
+        )
+        self._conn.commit()
+
+    def get_many(self, urls: List[str], chunk_size: int = 500) -> Dict[str, Dict]:
+        """
+        Получение сохраненного состояния для списка URL-ов
+
+        Args:
+            urls: Список URL-ов
+            chunk_size: Количество URL-ов в одном SQL запросе
+
+        Returns:
+            Словарь {url: {etag, last_modified, content_hash, published_at}}
+        """
+        states = {}
+        for i in range(0, len(urls), chunk_size):
+            chunk = urls[i:i + chunk_size]
+            placeholders = ",".join("?" * len(chunk))
+            rows = self._conn.execute(
+                "SELECT url, etag, last_modified, content_hash, published_at"
+                f" FROM url_state WHERE url IN ({placeholders})",
+                chunk
+            )
+            for url, etag, last_modified, content_hash, published_at in rows:
+                states[url] = {
+                    "etag": etag,
+                    "last_modified": last_modified,
+                    "content_hash": content_hash,
+                    "published_at": published_at
+                }
+        return states
+
+    def mark_published(self, states: Dict[str, Dict]):
+        """
+        Сохранение состояния успешно опубликованных URL-ов
+
+        Args:
+            states: Словарь {url: {etag, last_modified, content_hash}}
+        """
+        published_at = datetime.now().isoformat()
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO url_state"
+            " (url, etag, last_modified, content_hash, published_at)"
+            " VALUES (?, ?, ?, ?, ?)",
+            [
+                (url, state.get("etag"), state.get("last_modified"),
+                 state.get("content_hash"), published_at)
+                for url, state in states.items()
+            ]
+        )
+        self._conn.commit()
+
+    def refresh(self, states: Dict[str, Dict]):
+        """
+        Обновление валидаторов неизменившихся URL-ов (время публикации не меняется)
+
+        Args:
+            states: Словарь {url: {etag, last_modified, content_hash}}
+        """
+        self._conn.executemany(
+            "UPDATE url_state SET etag = ?, last_modified = ?, content_hash = ? WHERE url = ?",
+            [
+                (state.get("etag"), state.get("last_modified"), state.get("content_hash"), url)
+                for url, state in states.items()
+            ]
+        )
+        self._conn.commit()
+
+    def close(self):
+        """Закрытие соединения с базой"""
+        self._conn.close()
+
+
+class ChangeDetector:
+    """Отбор URL-ов, содержимое которых изменилось с последней публикации"""
+
+    def __init__(self, store: HashStore, fetch: bool = True,
+                 max_workers: int = 16, timeout: float = 15):
+        """
+        Args:
+            store: Хранилище состояния
+            fetch: Выполнять условные запросы к страницам без переданных метаданных
+            max_workers: Количество параллельных запросов
+            timeout: Таймаут запроса к странице в секундах
+        """
+        self.store = store
+        self.fetch = fetch
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.pending = {}
+        self.stats = {"changed": 0, "unchanged": 0, "fetch_errors": 0}
+        self._local = threading.local()
+
+    def detect(self, urls: List[str], metadata: Optional[Dict[str, Dict]] = None) -> List[str]:
+        """
+        Определение изменившихся URL-ов
+
+        Args:
+            urls: Список URL-ов
+            metadata: Необязательные метаданные {url: {etag, last_modified, content_hash}}
+
+        Returns:
+            Список изменившихся URL-ов в исходном порядке
+        """
+        metadata = metadata or {}
+        stored = self.store.get_many(urls)
+        decisions = {}
+        to_fetch = []
+
+        for url in urls:
+            known = {k: v for k, v in metadata.get(url, {}).items() if k in _STATE_FIELDS and v}
+            if known:
+                decisions[url] = (_differs(known, stored.get(url)), known)
+            elif self.fetch:
+                to_fetch.append(url)
+            else:
+                decisions[url] = (True, {})
+
+        if to_fetch:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+                fetched = pool.map(lambda u: self._check_remote(u, stored.get(u)), to_fetch)
+                for url, (is_changed, state) in zip(to_fetch, fetched):
+                    if state is None:
+                        self.stats["fetch_errors"] += 1
+                        state = {}
+                    decisions[url] = (is_changed, state)
+
+        changed = []
+        refreshed = {}
+        for url in urls:
+            is_changed, state = decisions[url]
+            if is_changed:
+                changed.append(url)
+                self.pending[url] = state
+                self.stats["changed"] += 1
+            else:
+                self.stats["unchanged"] += 1
+                # Страница отдана целиком с тем же содержимым: сохраняем новые ETag и
+                # Last-Modified, иначе следующие запуски снова получат не 304, а всю страницу
+                updates = {field: value for field, value in (state or {}).items()
+                           if value and value != stored[url].get(field)}
+                if updates:
+                    refreshed[url] = dict(stored[url], **updates)
+        if refreshed:
+            self.store.refresh(refreshed)
+        return changed
+
+    def commit(self, url_results: Iterable[Dict]):
+        """
+        Сохранение состояния для успешно опубликованных URL-ов
+
+        Args:
+            url_results: Результаты по URL-ам (поля url и success)
+        """
+        published = {}
+        for result in url_results:
+            url = result.get("url")
+            if result.get("success") and url in self.pending:
+                published[url] = self.pending.pop(url)
+        if published:
+            self.store.mark_published(published)
+
+    def _session(self) -> requests.Session:
+        """HTTP сессия текущего потока"""
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        return session
+
+    def _check_remote(self, url: str, stored: Optional[Dict]):
+        """
+        Условный запрос к странице
+
+        Returns:
+            Кортеж (изменился ли URL, новое состояние или None при ошибке запроса)
+        """
+        headers = {}
+        if stored:
+            if stored.get("etag"):
+                headers["If-None-Match"] = stored["etag"]
+            if stored.get("last_modified"):
+                headers["If-Modified-Since"] = stored["last_modified"]
+
+        try:
+            response = self._session().get(url, headers=headers, timeout=self.timeout)
+        except requests.RequestException:
+            # Страница недоступна - отправляем как раньше, без фильтрации
+            return True, None
+
+        if response.status_code == 304:
+            return False, {}
+        if response.status_code != 200:
+            return True, None
+
+        state = {
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "content_hash": hashlib.sha256(response.content).hexdigest()
+        }
+        return _differs({"content_hash": state["content_hash"]}, stored), state
+
+
+def _differs(current: Dict, stored: Optional[Dict]) -> bool:
+    """Сравнение текущего состояния с сохраненным по самому надежному полю"""
+    if not stored:
+        return True
+    for field in _STATE_FIELDS[::-1]:
+        if current.get(field):
+            return current[field] != stored.get(field)
+    return True
@@ -3,15 +3,12 @@
 Скрипт для проверки прав доступа сервисного аккаунта
 """
 
-import json
 import sys
 from pathlib import Path
 from urllib.parse import urlparse
 
 try:
-    import requests
-    from google.oauth2 import service_account
-    from google.auth.transport.requests import Request
+    from credentials_provider import get_credentials, get_session, load_account_info
 except ImportError as e:
     print(f"Ошибка импорта: {e}")
     print("Установите зависимости: pip install google-auth google-auth-oauthlib google-auth-httplib2 requests")
@@ -28,8 +25,7 @@ def check_service_account(service_account_path: str = "service_account.json"):
     print("🔍 Проверка сервисного аккаунта...")
     
     # Загружаем данные сервисного аккаунта
-    with open(service_account_path, 'r') as f:
-        service_account_data = json.load(f)
+    service_account_data = load_account_info(service_account_path)
     
     email = service_account_data.get('client_email')
     project_id = service_account_data.get('project_id')
@@ -39,11 +35,7 @@ def check_service_account(service_account_path: str = "service_account.json"):
     
     # Проверяем аутентификацию
     try:
-        credentials = service_account.Credentials.from_service_account_file(
-            service_account_path,
-            scopes=['https://www.googleapis.com/auth/indexing']
-        )
-        credentials.refresh(Request())
+        get_credentials(service_account_path)
         print("✅ Аутентификация успешна")
     except Exception as e:
         print(f"❌ Ошибка аутентификации: {e}")
@@ -63,12 +55,8 @@ def test_single_url(url: str, service_account_path: str = "service_account.json"
     print(f"\n🧪 Тестируем отправку URL: {url}")
     
     try:
-        # Аутентификация
-        credentials = service_account.Credentials.from_service_account_file(
-            service_account_path,
-            scopes=['https://www.googleapis.com/auth/indexing']
-        )
-        credentials.refresh(Request())
+        # Аутентификация (токен из кэша, обмен только при истечении)
+        credentials = get_credentials(service_account_path)
         access_token = credentials.token
         
         # Отправляем запрос
@@ -82,7 +70,7 @@ def test_single_url(url: str, service_account_path: str = "service_account.json"
             'type': 'URL_UPDATED'
         }
         
-        response = requests.post(
+        response = get_session().post(
             'https://indexing.googleapis.com/v3/urlNotifications:publish',
             headers=headers,
             json=data,
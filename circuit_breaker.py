@@ -0,0 +1,229 @@
+"""
+Автоматические выключатели (circuit breaker) для доменов и пакетного эндпоинта
+
+Если домен подряд получает 403, его выключатель размыкается: URL-ы домена не
+отправляются, а откладываются в журнал, остальные домены отправляются как
+обычно. Если эндпоинт /batch подряд отвечает 5xx или не отвечает, отправка
+приостанавливается целиком (а с ней и чтение источника) до пробного пакета:
+откладывать в журнал все URL-ы при общем сбое бессмысленно. После паузы
+выключатель пропускает пробные запросы (half-open): успех замыкает его,
+ошибка снова размыкает.
+
+Журнал - JSON lines файл с полем url, его можно отправить повторно:
+    python main.py deferred_urls.jsonl
+Перед повторной отправкой журнал переносится в отдельный файл (start_replay):
+новые отложенные и снова не отправленные URL-ы пишутся в чистый журнал, а не
+в читаемый файл, а полностью обработанный перенесенный файл удаляется.
+"""
+
+import json
+import os
+import time
+from datetime import datetime
+from typing import Dict, Iterable, List, Tuple
+from urllib.parse import urlparse
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+DEFAULT_JOURNAL = "deferred_urls.jsonl"
+
+
+class CircuitBreaker:
+    """Выключатель для одного домена или эндпоинта"""
+
+    def __init__(self, failure_threshold: int = 5, cooldown: float = 300, half_open_probes: int = 1):
+        """
+        Args:
+            failure_threshold: Количество ошибок подряд для размыкания
+            cooldown: Пауза перед пробными запросами в секундах
+            half_open_probes: Количество пробных запросов в полуоткрытом состоянии
+        """
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.half_open_probes = half_open_probes
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self.probes = 0
+
+    def allow(self) -> bool:
+        """Можно ли отправить еще один запрос"""
+        now = time.monotonic()
+        if self.state == CLOSED:
+            return True
+
+        # Пробы начинаются после паузы; если их результат так и не пришел
+        # (например, пакет не дошел), через паузу разрешаются новые пробы
+        if now - self.opened_at < self.cooldown:
+            if self.state == OPEN or self.probes >= self.half_open_probes:
+                return False
+        else:
+            self.probes = 0
+            self.opened_at = now
+
+        self.state = HALF_OPEN
+        self.probes += 1
+        return True
+
+    def retry_after(self) -> float:
+        """Секунд до следующего разрешенного запроса (0 - можно отправлять)"""
+        if self.state == CLOSED or (self.state == HALF_OPEN and self.probes < self.half_open_probes):
+            return 0.0
+        return max(0.0, self.cooldown - (time.monotonic() - self.opened_at))
+
+    def record_success(self):
+        """Учет успешного запроса"""
+        self.state = CLOSED
+        self.failures = 0
+
+    def record_failure(self):
+        """Учет неудачного запроса"""
+        self.failures += 1
+        if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+            self.state = OPEN
+            self.opened_at = time.monotonic()
+
+
+class DeferralJournal:
+    """Журнал отложенных URL-ов (JSON lines)"""
+
+    def __init__(self, path: str = DEFAULT_JOURNAL):
+        """
+        Args:
+            path: Путь к файлу журнала
+        """
+        self.path = path
+        self.count = 0
+
+    def append(self, items: List[Tuple[str, str]]):
+        """
+        Запись отложенных URL-ов
+
+        Args:
+            items: Список (url, причина - какой выключатель разомкнут)
+        """
+        if not items:
+            return
+        deferred_at = datetime.now().isoformat()
+        with open(self.path, 'a', encoding='utf-8') as f:
+            for url, reason in items:
+                f.write(json.dumps({"url": url, "reason": reason, "deferred_at": deferred_at},
+                                   ensure_ascii=False) + "\n")
+        self.count += len(items)
+
+
+def is_journal(path: str, journal_path: str) -> bool:
+    """Указывает ли path на файл журнала"""
+    return os.path.isfile(path) and os.path.isfile(journal_path) and os.path.samefile(path, journal_path)
+
+
+def start_replay(journal_path: str) -> str:
+    """
+    Перенос журнала в отдельный файл для повторной отправки
+
+    Args:
+        journal_path: Путь к журналу
+
+    Returns:
+        Путь к перенесенному файлу, из которого читаются URL-ы
+    """
+    base, ext = os.path.splitext(journal_path)
+    replay_path = f"{base}.replay_{datetime.now().strftime('%Y%m%d_%H%M%S')}{ext}"
+    os.replace(journal_path, replay_path)
+    return replay_path
+
+
+class CircuitBreakers:
+    """Выключатели для каждого домена и для пакетного эндпоинта"""
+
+    def __init__(self, journal: DeferralJournal, domain_threshold: int = 5, domain_cooldown: float = 600,
+                 endpoint_threshold: int = 3, endpoint_cooldown: float = 60,
+                 half_open_probes: int = 1):
+        """
+        Args:
+            journal: Журнал для отложенных URL-ов
+            domain_threshold: Ошибок 403 подряд для размыкания домена
+            domain_cooldown: Пауза для домена в секундах
+            endpoint_threshold: Неудачных пакетов подряд для размыкания эндпоинта
+            endpoint_cooldown: Пауза для эндпоинта в секундах
+            half_open_probes: Пробных URL-ов на домен в полуоткрытом состоянии
+        """
+        self.journal = journal
+        self.domain_threshold = domain_threshold
+        self.domain_cooldown = domain_cooldown
+        self.half_open_probes = half_open_probes
+        self.endpoint = CircuitBreaker(endpoint_threshold, endpoint_cooldown, half_open_probes=1)
+        self.domains = {}
+
+    def _domain(self, domain: str) -> CircuitBreaker:
+        breaker = self.domains.get(domain)
+        if breaker is None:
+            breaker = self.domains[domain] = CircuitBreaker(
+                self.domain_threshold, self.domain_cooldown, self.half_open_probes
+            )
+        return breaker
+
+    def wait_endpoint(self) -> float:
+        """
+        Ожидание, пока выключатель эндпоинта не пропустит пакет (при разомкнутом -
+        до конца паузы, после чего пакет уходит как пробный)
+
+        Returns:
+            Время ожидания в секундах
+        """
+        waited = 0.0
+        while not self.endpoint.allow():
+            delay = max(self.endpoint.retry_after(), 0.01)
+            time.sleep(delay)
+            waited += delay
+        return waited
+
+    def filter(self, urls: List[str]) -> List[str]:
+        """
+        Отбор URL-ов доменов с замкнутыми выключателями; остальные уходят в журнал
+
+        Args:
+            urls: URL-ы пакета
+
+        Returns:
+            URL-ы, которые можно отправлять
+        """
+        allowed, deferred = [], []
+        for url in urls:
+            domain = urlparse(url).netloc
+            if self._domain(domain).allow():
+                allowed.append(url)
+            else:
+                deferred.append((url, f"domain:{domain}"))
+        self.journal.append(deferred)
+        return allowed
+
+    def record(self, batch_result: Dict, url_results: Iterable[Dict]):
+        """
+        Учет результата пакета
+
+        Args:
+            batch_result: Результат пакета (success, status_code)
+            url_results: Результаты по URL-ам
+        """
+        status_code = batch_result.get("status_code")
+        if batch_result.get("success"):
+            self.endpoint.record_success()
+        elif status_code is None or status_code >= 500:
+            self.endpoint.record_failure()
+            return
+
+        for url_result in url_results:
+            breaker = self._domain(urlparse(url_result["url"]).netloc)
+            if url_result["success"]:
+                breaker.record_success()
+            elif url_result.get("status_code") == 403:
+                breaker.record_failure()
+
+    def open_circuits(self) -> List[str]:
+        """Список разомкнутых выключателей"""
+        names = ["endpoint"] if self.endpoint.state != CLOSED else []
+        names.extend(f"domain:{domain}" for domain, breaker in self.domains.items() if breaker.state != CLOSED)
+        return names
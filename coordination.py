@@ -0,0 +1,251 @@
+"""
+Координация нескольких хостов, отправляющих URL-ы в Google Indexing API
+
+Каждый запуск main.py перед отправкой пакета берет аренду (lease) на его URL-ы
+и резервирует квоту сервисного аккаунта в общем хранилище. URL-ы, арендованные
+другим хостом, пропускаются, как и URL-ы, опубликованные любым хостом за окно
+дедупликации (по умолчанию сутки; окно 0 разрешает повторную отправку).
+
+Хранилище подключается через CoordinationBackend. Встроенный бэкенд - SQLite
+файл на общем диске (блокировки SQLite сериализуют транзакции между процессами;
+на NFS блокировки файлов бывают ненадежны, используйте локальный или SMB/CIFS диск).
+Для Redis достаточно реализовать тот же интерфейс.
+"""
+
+import os
+import socket
+import sqlite3
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+DEFAULT_DEDUPE_WINDOW = 24 * 60 * 60
+
+
+class CoordinationBackend(ABC):
+    """Интерфейс общего хранилища аренд и счетчиков квоты"""
+
+    @abstractmethod
+    def acquire_leases(self, worker_id: str, urls: List[str], ttl: float,
+                       dedupe_window: float) -> Tuple[List[str], List[str]]:
+        """
+        Аренда URL-ов для отправки
+
+        Args:
+            worker_id: Идентификатор воркера
+            urls: Кандидаты на отправку
+            ttl: Время жизни аренды в секундах
+            dedupe_window: URL, опубликованный за это время, не выдается повторно (0 - без проверки)
+
+        Returns:
+            Кортеж (URL-ы, арендованные этим воркером; URL-ы, недавно опубликованные)
+        """
+
+    @abstractmethod
+    def complete(self, worker_id: str, urls: List[str]):
+        """Отметка URL-ов как опубликованных"""
+
+    @abstractmethod
+    def release(self, worker_id: str, urls: List[str]):
+        """Возврат аренды без публикации (URL сможет взять другой воркер)"""
+
+    @abstractmethod
+    def reserve_quota(self, account: str, amount: int, daily_limit: Optional[int]) -> int:
+        """
+        Резервирование квоты на сегодня
+
+        Args:
+            account: Сервисный аккаунт
+            amount: Нужное количество запросов
+            daily_limit: Дневной лимит аккаунта (None - без ограничения, только учет)
+
+        Returns:
+            Выделенное количество запросов (0..amount)
+        """
+
+    def close(self):
+        """Освобождение ресурсов"""
+
+
+class SQLiteCoordinationBackend(CoordinationBackend):
+    """Бэкенд на общем SQLite файле"""
+
+    def __init__(self, path: str, timeout: float = 30):
+        """
+        Args:
+            path: Путь к файлу базы на общем диске
+            timeout: Время ожидания блокировки в секундах
+        """
+        self.path = path
+        self._conn = sqlite3.connect(path, timeout=timeout, isolation_level=None)
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS leases ("
+            " url TEXT PRIMARY KEY,"
+            " worker_id TEXT,"
+            " expires_at REAL,"
+            " published_at REAL);"
+            "CREATE TABLE IF NOT EXISTS quota ("
+            " account TEXT,"
+            " day TEXT,"
+            " used INTEGER,"
+            " PRIMARY KEY (account, day));"
+        )
+
+    @contextmanager
+    def _transaction(self):
+        """Транзакция с блокировкой на запись (сериализует воркеров)"""
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._conn.execute("COMMIT")
+
+    def acquire_leases(self, worker_id: str, urls: List[str], ttl: float,
+                       dedupe_window: float) -> Tuple[List[str], List[str]]:
+        now = time.time()
+        acquired, published = [], []
+        with self._transaction():
+            for url in urls:
+                row = self._conn.execute(
+                    "SELECT worker_id, expires_at, published_at FROM leases WHERE url = ?", (url,)
+                ).fetchone()
+                if row:
+                    owner, expires_at, published_at = row
+                    if dedupe_window and published_at and now - published_at < dedupe_window:
+                        published.append(url)
+                        continue
+                    if owner != worker_id and expires_at and expires_at > now:
+                        continue
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO leases (url, worker_id, expires_at, published_at)"
+                    " VALUES (?, ?, ?, ?)",
+                    (url, worker_id, now + ttl, row[2] if row else None)
+                )
+                acquired.append(url)
+        return acquired, published
+
+    def complete(self, worker_id: str, urls: List[str]):
+        now = time.time()
+        with self._transaction():
+            self._conn.executemany(
+                "UPDATE leases SET published_at = ?, expires_at = NULL WHERE url = ? AND worker_id = ?",
+                [(now, url, worker_id) for url in urls]
+            )
+
+    def release(self, worker_id: str, urls: List[str]):
+        with self._transaction():
+            self._conn.executemany(
+                "UPDATE leases SET expires_at = NULL WHERE url = ? AND worker_id = ?",
+                [(url, worker_id) for url in urls]
+            )
+
+    def reserve_quota(self, account: str, amount: int, daily_limit: Optional[int]) -> int:
+        day = datetime.now().strftime("%Y-%m-%d")
+        with self._transaction():
+            row = self._conn.execute(
+                "SELECT used FROM quota WHERE account = ? AND day = ?", (account, day)
+            ).fetchone()
+            used = row[0] if row else 0
+            granted = amount if daily_limit is None else max(0, min(amount, daily_limit - used))
+            self._conn.execute(
+                "INSERT OR REPLACE INTO quota (account, day, used) VALUES (?, ?, ?)",
+                (account, day, used + granted)
+            )
+        return granted
+
+    def close(self):
+        self._conn.close()
+
+
+def create_backend(uri: str) -> CoordinationBackend:
+    """
+    Создание бэкенда по URI
+
+    Args:
+        uri: sqlite:///относительный/путь.db, sqlite:////абсолютный/путь.db
+            (как в SQLAlchemy: после sqlite:// идет путь, абсолютный начинается с /) или путь к файлу
+
+    Returns:
+        Бэкенд координации
+    """
+    if uri.startswith("sqlite:///"):
+        return SQLiteCoordinationBackend(uri[len("sqlite:///"):])
+    if "://" not in uri:
+        return SQLiteCoordinationBackend(uri)
+    raise ValueError(f"Неподдерживаемый бэкенд координации: {uri}")
+
+
+def default_worker_id() -> str:
+    """Идентификатор воркера: хост и PID"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class Coordinator:
+    """Аренда URL-ов и общий учет квоты для одного воркера"""
+
+    def __init__(self, backend: CoordinationBackend, account: str,
+                 worker_id: Optional[str] = None, daily_limit: Optional[int] = None,
+                 lease_ttl: float = 600, dedupe_window: float = DEFAULT_DEDUPE_WINDOW):
+        """
+        Args:
+            backend: Общее хранилище
+            account: Сервисный аккаунт, квота которого учитывается
+            worker_id: Идентификатор воркера (по умолчанию хост:PID)
+            daily_limit: Дневной лимит запросов аккаунта
+            lease_ttl: Время жизни аренды в секундах
+            dedupe_window: Окно, в течение которого опубликованный URL не отправляется повторно
+                (0 - только аренды, повторная публикация разрешена)
+        """
+        self.backend = backend
+        self.account = account
+        self.worker_id = worker_id or default_worker_id()
+        self.daily_limit = daily_limit
+        self.lease_ttl = lease_ttl
+        self.dedupe_window = dedupe_window
+        self.stats = {"leased_elsewhere": 0, "recently_published": 0, "quota_denied": 0}
+        self.quota_exhausted = False
+        self.quota_denied_urls = []
+
+    def claim(self, urls: List[str]) -> List[str]:
+        """
+        Аренда URL-ов пакета и резервирование квоты под них
+
+        Args:
+            urls: URL-ы пакета
+
+        Returns:
+            URL-ы, которые этот воркер должен отправить
+        """
+        self.quota_denied_urls = []
+        leased, published = self.backend.acquire_leases(self.worker_id, urls, self.lease_ttl, self.dedupe_window)
+        self.stats["recently_published"] += len(published)
+        self.stats["leased_elsewhere"] += len(urls) - len(leased) - len(published)
+        if not leased:
+            return []
+
+        granted = self.backend.reserve_quota(self.account, len(leased), self.daily_limit)
+        if granted < len(leased):
+            self.quota_denied_urls = leased[granted:]
+            self.backend.release(self.worker_id, self.quota_denied_urls)
+            self.stats["quota_denied"] += len(leased) - granted
+            self.quota_exhausted = True
+        return leased[:granted]
+
+    def finish(self, url_results: Iterable[Dict]):
+        """
+        Завершение аренды по результатам отправки
+
+        Args:
+            url_results: Результаты по URL-ам (поля url и success)
+        """
+        published, failed = [], []
+        for result in url_results:
+            (published if result["success"] else failed).append(result["url"])
+        if published:
+            self.backend.complete(self.worker_id, published)
+        if failed:
+            self.backend.release(self.worker_id, failed)
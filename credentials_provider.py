@@ -0,0 +1,102 @@
+"""
+Общий кэш учетных данных и HTTP сессии для всех инструментов
+
+Учетные данные сервисного аккаунта создаются один раз на процесс для пары
+(файл ключа, время его изменения): PEM ключ разбирается один раз, а токен
+обменивается заново только когда истекает. Замена файла ключа сбрасывает кэш.
+"""
+
+import json
+import os
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import requests
+from google.oauth2 import service_account
+from google.auth.transport.requests import Request
+
+from indexing_batch import INDEXING_SCOPES
+
+_lock = threading.RLock()
+_credentials = {}
+_account_info = {}
+_session = None
+
+
+def _cache_key(path: str, scopes: List[str]) -> Tuple[str, int, Tuple[str, ...]]:
+    """Ключ кэша: абсолютный путь, время изменения файла и области доступа"""
+    real_path = os.path.realpath(path)
+    return real_path, os.stat(real_path).st_mtime_ns, tuple(scopes)
+
+
+def load_account_info(path: str) -> Dict:
+    """
+    Содержимое JSON файла сервисного аккаунта (кэшируется)
+
+    Args:
+        path: Путь к файлу service_account.json
+
+    Returns:
+        Словарь с полями файла (client_email, project_id, ...)
+    """
+    key = _cache_key(path, [])
+    with _lock:
+        info = _account_info.get(key)
+        if info is None:
+            with open(key[0], 'r') as f:
+                info = _account_info[key] = json.load(f)
+    return info
+
+
+def get_credentials(path: str, scopes: Optional[List[str]] = None,
+                    refresh: bool = True) -> service_account.Credentials:
+    """
+    Учетные данные сервисного аккаунта из кэша процесса
+
+    Args:
+        path: Путь к файлу service_account.json
+        scopes: Области доступа (по умолчанию Indexing API)
+        refresh: Получить токен, если его нет или он истек
+
+    Returns:
+        Учетные данные с действующим токеном (если refresh=True)
+    """
+    key = _cache_key(path, scopes or INDEXING_SCOPES)
+    with _lock:
+        credentials = _credentials.get(key)
+        if credentials is None:
+            credentials = _credentials[key] = service_account.Credentials.from_service_account_info(
+                load_account_info(key[0]), scopes=list(key[2])
+            )
+        if refresh and not credentials.valid:
+            credentials.refresh(Request(get_session()))
+    return credentials
+
+
+def get_access_token(path: str, scopes: Optional[List[str]] = None) -> str:
+    """
+    Действующий токен доступа (обновляется только при истечении)
+
+    Args:
+        path: Путь к файлу service_account.json
+        scopes: Области доступа (по умолчанию Indexing API)
+
+    Returns:
+        OAuth токен
+    """
+    return get_credentials(path, scopes).token
+
+
+def get_session() -> requests.Session:
+    """Общая HTTP сессия процесса (переиспользует соединения)"""
+    global _session
+    if _session is None:
+        _session = requests.Session()
+    return _session
+
+
+def clear_cache():
+    """Сброс кэша учетных данных"""
+    with _lock:
+        _credentials.clear()
+        _account_info.clear()
@@ -0,0 +1,175 @@
+"""
+Кодирование пакетных запросов и разбор ответов Google Indexing API
+
+Модуль не печатает в stdout и не зависит от google-auth, поэтому используется
+как синхронным GoogleIndexingBulk, так и асинхронным клиентом.
+"""
+
+import json
+import re
+import uuid
+from typing import Dict, List, Tuple
+
+BATCH_ENDPOINT = 'https://indexing.googleapis.com/batch'
+PUBLISH_PATH = '/v3/urlNotifications:publish'
+INDEXING_SCOPES = ['https://www.googleapis.com/auth/indexing']
+MAX_BATCH_SIZE = 100
+RETRYABLE_STATUS_CODES = (429, 500, 502, 503, 504)
+
+_BOUNDARY_RE = re.compile(r'boundary="?([^";]+)"?', re.IGNORECASE)
+_CONTENT_ID_RE = re.compile(r'Content-ID:\s*<response-item(\d+)>', re.IGNORECASE)
+_STATUS_LINE_RE = re.compile(r'HTTP/\d(?:\.\d)?\s+(\d{3})')
+
+
+def build_batch_request(urls: List[str], access_token: str,
+                        notification_type: str = 'URL_UPDATED') -> Tuple[Dict[str, str], bytes]:
+    """
+    Формирование multipart/mixed запроса для пакета URL-ов
+
+    Args:
+        urls: Список URL-ов для пакета
+        access_token: OAuth токен доступа
+        notification_type: Тип уведомления (URL_UPDATED или URL_DELETED)
+
+    Returns:
+        Кортеж (заголовки, тело запроса)
+    """
+    boundary = f"batch_{uuid.uuid4().hex}"
+    headers = {
+        'Content-Type': f'multipart/mixed; boundary={boundary}',
+        'Authorization': f'Bearer {access_token}'
+    }
+
+    body_parts = []
+
+    for index, url in enumerate(urls):
+        json_data = json.dumps({'url': url, 'type': notification_type})
+
+        # Content-ID с номером позволяет сопоставить ответ с URL-ом
+        part = (
+            f"--{boundary}\r\n"
+            f"Content-Type: application/http\r\n"
+            f"Content-ID: <item{index}>\r\n\r\n"
+            f"POST {PUBLISH_PATH} HTTP/1.1\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(json_data)}\r\n\r\n"
+            f"{json_data}\r\n"
+        )
+        body_parts.append(part)
+
+    body_parts.append(f"--{boundary}--")
+
+    return headers, "\r\n".join(body_parts).encode('utf-8')
+
+
+def parse_batch_response(urls: List[str], content_type: str, body: str) -> List[Dict]:
+    """
+    Разбор multipart/mixed ответа на результаты по каждому URL-у
+
+    Args:
+        urls: Список URL-ов в том порядке, в котором они были отправлены
+        content_type: Заголовок Content-Type ответа
+        body: Тело ответа
+
+    Returns:
+        Список результатов в порядке URL-ов. URL-ы, для которых в ответе
+        не нашлось части, помечаются как неуспешные.
+    """
+    parsed = {}
+
+    match = _BOUNDARY_RE.search(content_type or '')
+    if match:
+        for part in body.split(f"--{match.group(1)}"):
+            id_match = _CONTENT_ID_RE.search(part)
+            status_match = _STATUS_LINE_RE.search(part)
+            if not id_match or not status_match:
+                continue
+
+            index = int(id_match.group(1))
+            if index >= len(urls):
+                continue
+
+            status_code = int(status_match.group(1))
+            payload = _extract_json(part[status_match.end():])
+            result = {
+                "url": urls[index],
+                "success": status_code == 200,
+                "status_code": status_code
+            }
+            if status_code == 200:
+                result["response"] = payload
+            else:
+                error = payload.get("error", {}) if isinstance(payload, dict) else {}
+                message = error.get("message") if isinstance(error, dict) else None
+                result["error"] = f"HTTP {status_code}: {message or payload}"
+            parsed[index] = result
+
+    results = []
+    for index, url in enumerate(urls):
+        results.append(parsed.get(index, {
+            "url": url,
+            "success": False,
+            "status_code": None,
+            "error": "Ответ для URL-а не найден в пакетном ответе"
+        }))
+    return results
+
+
+def failed_url_results(urls: List[str], batch_result: Dict) -> List[Dict]:
+    """
+    Результаты по URL-ам для пакета, который не был принят целиком
+
+    Args:
+        urls: Список URL-ов пакета
+        batch_result: Результат пакета (status_code, error)
+
+    Returns:
+        Список неуспешных результатов в порядке URL-ов
+    """
+    return [
+        {
+            "url": url,
+            "success": False,
+            "status_code": batch_result.get("status_code"),
+            "error": batch_result.get("error")
+        }
+        for url in urls
+    ]
+
+
+def categorize_error(status_code, error: str = "") -> str:
+    """
+    Категория ошибки по коду ответа
+
+    Args:
+        status_code: HTTP код ответа (None - ответ не получен)
+        error: Текст ошибки
+
+    Returns:
+        Название категории
+    """
+    if status_code is None:
+        return "Сетевые ошибки" if error else "Другие ошибки"
+    if status_code == 403:
+        return "Права доступа"
+    if status_code == 429:
+        return "Превышен лимит"
+    if status_code == 401:
+        return "Аутентификация"
+    if status_code == 400:
+        return "Некорректный запрос"
+    if status_code >= 500:
+        return "Ошибка сервера"
+    return "Другие ошибки"
+
+
+def _extract_json(text: str):
+    """Извлечение JSON тела из части ответа"""
+    start = text.find('{')
+    end = text.rfind('}')
+    if start == -1 or end < start:
+        return text.strip()
+    try:
+        return json.loads(text[start:end + 1])
+    except ValueError:
+        return text[start:end + 1]
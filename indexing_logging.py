@@ -0,0 +1,166 @@
+"""
+Логирование Google Indexing API Bulk Tool
+
+Записи попадают в очередь (QueueHandler) и пишутся в файл отдельным потоком
+(QueueListener), поэтому запись лога не блокирует отправку пакетов.
+Поддерживаются текстовый формат и JSON lines, ротация файла по размеру и
+времени, а также идентификатор пакета (batch_id) в каждой записи.
+"""
+
+import atexit
+import contextvars
+import json
+import logging
+import os
+import queue
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Optional
+
+LOGGER_NAME = "indexing"
+TEXT_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+_batch_id = contextvars.ContextVar("batch_id", default=None)
+_listener = None
+
+# Без явной настройки библиотека ничего не выводит
+logging.getLogger(LOGGER_NAME).addHandler(logging.NullHandler())
+
+# Стандартные атрибуты LogRecord, которые не считаются пользовательскими полями
+_RESERVED_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    """Форматирование записи в одну JSON строку"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage()
+        }
+        for key, value in vars(record).items():
+            if key not in _RESERVED_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class BatchIdFilter(logging.Filter):
+    """Добавление batch_id текущего пакета в запись"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if getattr(record, "batch_id", None) is None:
+            batch_id = _batch_id.get()
+            if batch_id is not None:
+                record.batch_id = batch_id
+        return True
+
+
+class SizeAndTimeRotatingFileHandler(RotatingFileHandler):
+    """Ротация файла при превышении размера или по истечении интервала"""
+
+    def __init__(self, filename: str, max_bytes: int = 0, backup_count: int = 0,
+                 interval: float = 0, encoding: Optional[str] = 'utf-8'):
+        """
+        Args:
+            filename: Путь к файлу лога
+            max_bytes: Максимальный размер файла (0 - без ограничения)
+            backup_count: Количество хранимых архивных файлов
+            interval: Интервал ротации в секундах (0 - без ротации по времени)
+            encoding: Кодировка файла
+        """
+        super().__init__(filename, maxBytes=max_bytes, backupCount=backup_count, encoding=encoding)
+        self.interval = interval
+        self.rollover_at = None
+        if interval:
+            # Как в TimedRotatingFileHandler: интервал отсчитывается от последней записи
+            # в существующий файл, иначе короткие запуски никогда не дождутся ротации
+            try:
+                started = os.stat(self.baseFilename).st_mtime
+            except OSError:
+                started = time.time()
+            self.rollover_at = started + interval
+
+    def shouldRollover(self, record: logging.LogRecord) -> bool:
+        if self.rollover_at is not None and time.time() >= self.rollover_at:
+            return True
+        return bool(super().shouldRollover(record))
+
+    def doRollover(self):
+        super().doRollover()
+        if self.interval:
+            self.rollover_at = time.time() + self.interval
+
+
+def setup_logging(log_file: str = "indexing.log", json_format: bool = False,
+                  console_level: int = logging.WARNING, max_bytes: int = 10 * 1024 * 1024,
+                  backup_count: int = 5, rotate_interval: float = 24 * 3600) -> logging.Logger:
+    """
+    Настройка логирования (повторные вызовы возвращают уже настроенный логгер)
+
+    Args:
+        log_file: Путь к файлу лога
+        json_format: Писать записи в формате JSON lines
+        console_level: Минимальный уровень для вывода в консоль
+        max_bytes: Размер файла для ротации
+        backup_count: Количество архивных файлов
+        rotate_interval: Интервал ротации по времени в секундах
+
+    Returns:
+        Логгер инструмента
+    """
+    global _listener
+
+    logger = logging.getLogger(LOGGER_NAME)
+    if _listener is not None:
+        return logger
+
+    formatter = JsonFormatter() if json_format else logging.Formatter(TEXT_FORMAT)
+
+    file_handler = SizeAndTimeRotatingFileHandler(
+        log_file, max_bytes=max_bytes, backup_count=backup_count, interval=rotate_interval
+    )
+    file_handler.setFormatter(formatter)
+
+    console_handler = logging.StreamHandler()
+    console_handler.setLevel(console_level)
+    console_handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+
+    log_queue = queue.Queue(-1)
+    queue_handler = QueueHandler(log_queue)
+    queue_handler.addFilter(BatchIdFilter())
+
+    _listener = QueueListener(log_queue, file_handler, console_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+    logger.handlers = [queue_handler]
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    return logger
+
+
+def new_batch_id() -> str:
+    """Новый идентификатор пакета"""
+    return uuid.uuid4().hex[:12]
+
+
+@contextmanager
+def batch_context(batch_id: str):
+    """
+    Привязка batch_id ко всем записям лога внутри блока
+
+    Args:
+        batch_id: Идентификатор пакета
+    """
+    token = _batch_id.set(batch_id)
+    try:
+        yield batch_id
+    finally:
+        _batch_id.reset(token)
@@ -0,0 +1,566 @@
+#!/usr/bin/env python3
+"""
+Нагрузочный тест Google Indexing API Bulk Tool
+
+Генерирует синтетические URL-ы с неравномерным распределением по доменам
+(закон Ципфа) и прогоняет через настоящий конвейер GoogleIndexingBulk,
+направленный на локальный мок пакетного эндпоинта. Мок отвечает по сценарию
+ошибок (429, 5xx, 403 по доменам, простои) и проверяет срок жизни токена.
+Во время прогона снимаются пропускная способность и RSS процесса, отчет
+сохраняется в JSON для сравнения между версиями.
+"""
+
+import contextlib
+import itertools
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urlparse
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+from main import GoogleIndexingBulk
+from adaptive_batching import AdaptiveBatchSizer
+from circuit_breaker import CircuitBreakers, DeferralJournal
+from indexing_logging import setup_logging
+from url_sources import UrlItem, UrlSource, create_source
+
+DEFAULT_REPORT = "load_test_report.json"
+SERVICE_ACCOUNT = "load-test@example.iam.gserviceaccount.com"
+
+_ITEM_RE = re.compile(r'Content-ID:\s*<item(\d+)>.*?\r\n\r\n.*?\r\n\r\n(\{[^\r\n]*\})', re.DOTALL)
+
+
+class SyntheticUrls:
+    """Генератор URL-ов с распределением по доменам по закону Ципфа"""
+
+    def __init__(self, count: Optional[int], domains: int = 50, skew: float = 1.0, seed: int = 0,
+                 deadline: Optional[float] = None):
+        """
+        Args:
+            count: Количество URL-ов (None - без ограничения, до deadline)
+            domains: Количество доменов
+            skew: Показатель неравномерности (0 - равномерно, 1 - Ципф, больше - сильнее)
+            seed: Зерно генератора
+            deadline: Момент time.monotonic(), после которого генерация прекращается
+        """
+        self.count = count
+        self.domains = [f"site{index}.load-test.example" for index in range(1, domains + 1)]
+        self.cum_weights = list(itertools.accumulate(1 / rank ** skew for rank in range(1, domains + 1)))
+        self.seed = seed
+        self.deadline = deadline
+
+    def __iter__(self) -> Iterator[str]:
+        rng = random.Random(self.seed)
+        total = self.cum_weights[-1]
+        numbers = range(self.count) if self.count is not None else itertools.count()
+        for number in numbers:
+            # Проверка часов раз в 1000 URL-ов, чтобы не замедлять генерацию
+            if self.deadline is not None and number % 1000 == 0 and time.monotonic() >= self.deadline:
+                return
+            domain = self.domains[bisect_left(self.cum_weights, rng.random() * total)]
+            yield f"https://{domain}/page/{number}"
+
+
+class SyntheticSource(UrlSource):
+    """Источник URL-ов из SyntheticUrls для потоковой отправки"""
+
+    def __init__(self, urls: SyntheticUrls):
+        super().__init__()
+        self.urls = urls
+
+    def _read(self) -> Iterator[UrlItem]:
+        for url in self.urls:
+            yield url, {}
+
+
+class FailureScript:
+    """Сценарий ошибок мок-эндпоинта"""
+
+    def __init__(self, throttle_rate: float = 0, server_error_rate: float = 0, item_error_rate: float = 0,
+                 forbidden_domains: Tuple[str, ...] = (), outages: Tuple[Tuple[float, float], ...] = (),
+                 latency: float = 0, seed: int = 0):
+        """
+        Args:
+            throttle_rate: Доля пакетов, получающих 429
+            server_error_rate: Доля пакетов, получающих 503
+            item_error_rate: Доля URL-ов, получающих 500 внутри успешного пакета
+            forbidden_domains: Домены, URL-ы которых всегда получают 403
+            outages: Простои эндпоинта (начало, длительность) в секундах от старта
+            latency: Задержка ответа в секундах
+            seed: Зерно генератора
+        """
+        self.throttle_rate = throttle_rate
+        self.server_error_rate = server_error_rate
+        self.item_error_rate = item_error_rate
+        self.forbidden_domains = set(forbidden_domains)
+        self.outages = outages
+        self.latency = latency
+        self.started = time.monotonic()
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def batch_status(self) -> Optional[int]:
+        """Код ошибки всего пакета или None, если пакет обрабатывается"""
+        elapsed = time.monotonic() - self.started
+        if any(start <= elapsed < start + duration for start, duration in self.outages):
+            return 503
+        with self._lock:
+            value = self._rng.random()
+        if value < self.throttle_rate:
+            return 429
+        if value < self.throttle_rate + self.server_error_rate:
+            return 503
+        return None
+
+    def item_status(self, url: str) -> int:
+        """Код ответа для одного URL-а"""
+        if urlparse(url).netloc in self.forbidden_domains:
+            return 403
+        if self.item_error_rate:
+            with self._lock:
+                if self._rng.random() < self.item_error_rate:
+                    return 500
+        return 200
+
+
+class FakeTokens:
+    """Выдача токенов с ограниченным сроком жизни (мок проверяет срок)"""
+
+    def __init__(self, ttl: float = 3600):
+        """
+        Args:
+            ttl: Срок жизни токена в секундах
+        """
+        self.ttl = ttl
+        self.margin = min(60, ttl / 10)
+        self.refreshes = 0
+        self._token = None
+        self._expires_at = 0
+        self._lock = threading.Lock()
+
+    def get(self) -> str:
+        """Действующий токен (новый выдается незадолго до истечения)"""
+        with self._lock:
+            if time.time() >= self._expires_at - self.margin:
+                self._expires_at = time.time() + self.ttl
+                self._token = f"load-test:{self._expires_at:.3f}"
+                self.refreshes += 1
+            return self._token
+
+    @staticmethod
+    def expired(token: str) -> bool:
+        """Истек ли токен (или он не выдан FakeTokens)"""
+        try:
+            return float(token.rsplit(':', 1)[1]) <= time.time()
+        except (IndexError, ValueError):
+            return True
+
+
+class MockIndexingServer:
+    """Локальный мок пакетного эндпоинта Indexing API"""
+
+    def __init__(self, script: FailureScript, port: int = 0):
+        """
+        Args:
+            script: Сценарий ошибок
+            port: Порт (0 - любой свободный)
+        """
+        self.script = script
+        self.stats = {"requests": 0, "urls": 0, "batch_status": {}, "item_status": {}}
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1', port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name="mock-indexing", daemon=True)
+
+    @property
+    def endpoint(self) -> str:
+        """URL пакетного эндпоинта мока"""
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/batch"
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _count(self, key: str, status: int):
+        with self._lock:
+            counters = self.stats[key]
+            counters[status] = counters.get(status, 0) + 1
+
+    def _respond(self, urls: List[str], authorization: str) -> Tuple[int, str, bytes]:
+        """Статус, Content-Type и тело ответа на пакет"""
+        with self._lock:
+            self.stats["requests"] += 1
+            self.stats["urls"] += len(urls)
+
+        if FakeTokens.expired(authorization[len('Bearer '):]):
+            status = 401
+        else:
+            status = self.script.batch_status()
+        if status:
+            self._count("batch_status", status)
+            message = json.dumps({"error": {"code": status, "message": f"Load test status {status}"}})
+            return status, 'application/json', message.encode('utf-8')
+        self._count("batch_status", 200)
+
+        boundary = "load_test_boundary"
+        parts = []
+        for index, url in enumerate(urls):
+            item_status = self.script.item_status(url)
+            self._count("item_status", item_status)
+            if item_status == 200:
+                payload = {"urlNotificationMetadata": {"url": url}}
+            else:
+                payload = {"error": {"code": item_status, "message": f"Load test status {item_status}"}}
+            parts.append(
+                f"--{boundary}\r\n"
+                f"Content-Type: application/http\r\n"
+                f"Content-ID: <response-item{index}>\r\n\r\n"
+                f"HTTP/1.1 {item_status} Load Test\r\n"
+                f"Content-Type: application/json\r\n\r\n"
+                f"{json.dumps(payload)}\r\n"
+            )
+        parts.append(f"--{boundary}--")
+        return 200, f'multipart/mixed; boundary={boundary}', "".join(parts).encode('utf-8')
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0))).decode('utf-8')
+                urls = [json.loads(item)['url'] for _, item in _ITEM_RE.findall(body)]
+                if server.script.latency:
+                    time.sleep(server.script.latency)
+                status, content_type, payload = server._respond(urls, self.headers.get('Authorization', ''))
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+        return Handler
+
+
+class LoadTestIndexingBulk(GoogleIndexingBulk):
+    """GoogleIndexingBulk, направленный на мок, с учетом обработанных URL-ов"""
+
+    def __init__(self, endpoint: str, tokens: FakeTokens, batch_delay: float = 0):
+        """
+        Args:
+            endpoint: URL пакетного эндпоинта мока
+            tokens: Источник токенов
+            batch_delay: Пауза между пакетами в секундах
+        """
+        self.batch_endpoint = endpoint
+        self.batch_delay = batch_delay
+        self.retry_delay = batch_delay
+        self.tokens = tokens
+        self.processed = 0
+        self.batches = 0
+        # Файл ключа не нужен: аутентификация подменена
+        super().__init__(os.devnull)
+
+    def _authenticate(self):
+        self.service_account_email = SERVICE_ACCOUNT
+
+    def _get_access_token(self) -> str:
+        return self.tokens.get()
+
+    def _send_batch(self, batch: List[str], results: Dict, *args, **kwargs) -> bool:
+        sent = super()._send_batch(batch, results, *args, **kwargs)
+        self.processed = results["success_count"] + results["error_count"]
+        self.batches = results["batch_count"]
+        return sent
+
+
+def current_rss_mb() -> Optional[float]:
+    """Текущий RSS процесса в МБ (пиковый, если текущий недоступен)"""
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1024 / 1024
+    except (OSError, ValueError, AttributeError):
+        pass
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss - в килобайтах на Linux и в байтах на macOS
+    return peak / 1024 / 1024 if sys.platform == 'darwin' else peak / 1024
+
+
+class Sampler:
+    """Периодические замеры пропускной способности и памяти в отдельном потоке"""
+
+    def __init__(self, client: LoadTestIndexingBulk, tokens: FakeTokens, interval: float = 5, output=None):
+        """
+        Args:
+            client: Клиент нагрузочного теста
+            tokens: Источник токенов
+            interval: Интервал замеров в секундах
+            output: Поток для вывода замеров (None - не выводить)
+        """
+        self.client = client
+        self.tokens = tokens
+        self.interval = interval
+        self.output = output
+        self.samples = []
+        self.started = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="load-test-sampler", daemon=True)
+
+    def start(self):
+        self.started = time.monotonic()
+        self._sample()
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self._sample()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def _sample(self):
+        elapsed = time.monotonic() - self.started
+        processed = self.client.processed
+        previous = self.samples[-1] if self.samples else None
+        window = elapsed - previous["elapsed"] if previous else 0
+        sample = {
+            "elapsed": round(elapsed, 3),
+            "processed": processed,
+            "batches": self.client.batches,
+            "urls_per_sec": round((processed - previous["processed"]) / window, 1) if window > 0 else 0.0,
+            "rss_mb": current_rss_mb(),
+            "token_refreshes": self.tokens.refreshes
+        }
+        self.samples.append(sample)
+        if self.output:
+            rss = f"{sample['rss_mb']:.1f} МБ" if sample['rss_mb'] is not None else "N/A"
+            print(f"   ⏱️  {elapsed:8.1f} с: обработано {processed}, "
+                  f"{sample['urls_per_sec']} URL/с, RSS {rss}", file=self.output, flush=True)
+
+
+def parse_outage(value: str) -> Tuple[float, float]:
+    """Разбор простоя в формате НАЧАЛО:ДЛИТЕЛЬНОСТЬ (секунды)"""
+    start, duration = value.split(':')
+    return float(start), float(duration)
+
+
+def build_report(args, results: Dict, sampler: Sampler, server: MockIndexingServer,
+                 tokens: FakeTokens, duration: float) -> Dict:
+    """Отчет нагрузочного теста: параметры, итоги и замеры"""
+    samples = sampler.samples
+    rss_values = [sample["rss_mb"] for sample in samples if sample["rss_mb"] is not None]
+    processed = results["success_count"] + results["error_count"]
+    return {
+        "config": {key: value for key, value in vars(args).items() if key != 'command'},
+        "summary": {
+            "total_urls": results["total_urls"],
+            "processed": processed,
+            "success_count": results["success_count"],
+            "error_count": results["error_count"],
+            "batches": results["batch_count"],
+            "deferred_count": results.get("deferred_count", 0),
+            "duration": round(duration, 3),
+            "urls_per_sec": round(processed / duration, 1) if duration > 0 else 0.0,
+            "rss_start_mb": rss_values[0] if rss_values else None,
+            "rss_peak_mb": max(rss_values) if rss_values else None,
+            "rss_growth_mb": rss_values[-1] - rss_values[0] if rss_values else None,
+            "token_refreshes": tokens.refreshes,
+            "server": server.stats
+        },
+        "samples": samples
+    }
+
+
+def run_load_test(args) -> Dict:
+    """
+    Прогон конвейера против мока
+
+    Returns:
+        Отчет нагрузочного теста
+    """
+    setup_logging(log_file=args.log_file)
+
+    generator = SyntheticUrls(
+        args.count, args.domains, args.skew, args.seed,
+        deadline=time.monotonic() + args.duration if args.duration else None
+    )
+    forbidden = tuple(generator.domains[-args.forbidden_domains:]) if args.forbidden_domains else ()
+    script = FailureScript(
+        args.throttle_rate, args.server_error_rate, args.item_error_rate, forbidden,
+        tuple(args.outage or ()), args.latency, args.seed
+    )
+    server = MockIndexingServer(script)
+    server.start()
+
+    tokens = FakeTokens(args.token_ttl)
+    client = LoadTestIndexingBulk(server.endpoint, tokens, args.batch_delay)
+    batch_sizer = AdaptiveBatchSizer(args.batch_size) if args.adaptive_batch else None
+    breakers = CircuitBreakers(DeferralJournal(args.journal_file)) if args.circuit_breaker else None
+    source = create_source(args.urls_file) if args.urls_file else SyntheticSource(generator)
+
+    print(f"🧪 Нагрузочный тест: мок {server.endpoint}, режим {args.mode}")
+    sampler = Sampler(client, tokens, args.sample_interval, sys.stdout)
+    quiet = open(os.devnull, 'w') if not args.verbose else None
+    started = time.monotonic()
+    try:
+        with contextlib.redirect_stdout(quiet) if quiet else contextlib.nullcontext():
+            if args.mode == 'list':
+                urls = [url for url, _ in source]
+                sampler.start()
+                results = client.submit_urls(urls, args.batch_size, args.max_retries, batch_sizer,
+                                             breakers=breakers)
+            else:
+                sampler.start()
+                results = client.submit_source(source, args.batch_size, args.max_retries, batch_sizer,
+                                               breakers=breakers, queue_size=args.queue_size)
+    finally:
+        duration = time.monotonic() - started
+        if sampler.started is not None:
+            sampler.stop()
+        server.stop()
+        if quiet:
+            quiet.close()
+
+    return build_report(args, results, sampler, server, tokens, duration)
+
+
+def main():
+    """Главная функция"""
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Нагрузочный тест Google Indexing API Bulk Tool на локальном моке",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Примеры использования:
+  python load_test.py generate urls_1m.txt --count 1000000 --skew 1.2
+  python load_test.py run --count 100000
+  python load_test.py run --duration 86400 --throttle-rate 0.01 --outage 3600:300
+  python load_test.py run --count 1000000 --mode list --max-rss-growth 500
+        """
+    )
+
+    subparsers = parser.add_subparsers(dest='command')
+
+    def add_generator_arguments(subparser):
+        subparser.add_argument('--count', type=int, default=100000, help='Количество URL-ов (по умолчанию: 100000)')
+        subparser.add_argument('--domains', type=int, default=50, help='Количество доменов (по умолчанию: 50)')
+        subparser.add_argument('--skew', type=float, default=1.0,
+                               help='Неравномерность по доменам: 0 - равномерно, 1 - Ципф (по умолчанию: 1.0)')
+        subparser.add_argument('--seed', type=int, default=0, help='Зерно генератора (по умолчанию: 0)')
+
+    generate_parser = subparsers.add_parser('generate', help='Сгенерировать файл синтетических URL-ов')
+    generate_parser.add_argument('output', help='Файл для записи URL-ов')
+    add_generator_arguments(generate_parser)
+
+    run_parser = subparsers.add_parser('run', help='Прогнать конвейер против локального мока')
+    add_generator_arguments(run_parser)
+    run_parser.add_argument('--urls-file', help='Взять URL-ы из файла вместо генерации')
+    run_parser.add_argument('--duration', type=float,
+                            help='Длительность генерации URL-ов в секундах (soak тест; --count игнорируется, '
+                                 'URL-ы из очереди дорабатываются после окончания)')
+    run_parser.add_argument('--mode', choices=['stream', 'list'], default='stream',
+                            help='stream - submit_source, list - submit_urls со списком в памяти')
+    run_parser.add_argument('--batch-size', type=int, default=100, help='Размер пакета (по умолчанию: 100)')
+    run_parser.add_argument('--max-retries', type=int, default=3, help='Максимальное количество попыток')
+    run_parser.add_argument('--batch-delay', type=float, default=0,
+                            help='Пауза между пакетами в секундах (по умолчанию: 0)')
+    run_parser.add_argument('--queue-size', type=int, default=10000, help='Размер очереди источника')
+    run_parser.add_argument('--adaptive-batch', action='store_true', help='Адаптивный размер пакета')
+    run_parser.add_argument('--circuit-breaker', action='store_true', help='Включить выключатели')
+    run_parser.add_argument('--journal-file', default='load_test_deferred.jsonl',
+                            help='Журнал отложенных URL-ов (по умолчанию: load_test_deferred.jsonl)')
+    run_parser.add_argument('--latency', type=float, default=0.05,
+                            help='Задержка ответа мока в секундах (по умолчанию: 0.05)')
+    run_parser.add_argument('--throttle-rate', type=float, default=0, help='Доля пакетов с ответом 429')
+    run_parser.add_argument('--server-error-rate', type=float, default=0, help='Доля пакетов с ответом 503')
+    run_parser.add_argument('--item-error-rate', type=float, default=0, help='Доля URL-ов с ответом 500')
+    run_parser.add_argument('--forbidden-domains', type=int, default=0,
+                            help='Сколько наименее популярных доменов всегда получают 403')
+    run_parser.add_argument('--outage', type=parse_outage, action='append',
+                            help='Простой эндпоинта НАЧАЛО:ДЛИТЕЛЬНОСТЬ в секундах (можно несколько)')
+    run_parser.add_argument('--token-ttl', type=float, default=3600,
+                            help='Срок жизни токена в секундах (по умолчанию: 3600)')
+    run_parser.add_argument('--sample-interval', type=float, default=5,
+                            help='Интервал замеров в секундах (по умолчанию: 5)')
+    run_parser.add_argument('--report', default=DEFAULT_REPORT,
+                            help=f'Файл отчета (по умолчанию: {DEFAULT_REPORT})')
+    run_parser.add_argument('--log-file', default='load_test.log', help='Файл лога (по умолчанию: load_test.log)')
+    run_parser.add_argument('--min-throughput', type=float,
+                            help='Завершиться с ошибкой, если URL/с ниже указанного')
+    run_parser.add_argument('--max-rss-growth', type=float,
+                            help='Завершиться с ошибкой, если RSS вырос больше, чем на указанное число МБ')
+    run_parser.add_argument('--verbose', action='store_true', help='Показывать вывод конвейера')
+
+    args = parser.parse_args()
+
+    if not args.command:
+        parser.print_help()
+        return
+
+    try:
+        if args.command == 'generate':
+            with open(args.output, 'w', encoding='utf-8') as f:
+                for url in SyntheticUrls(args.count, args.domains, args.skew, args.seed):
+                    f.write(url + "\n")
+            print(f"📝 Сгенерировано {args.count} URL-ов по {args.domains} доменам в {args.output}")
+            return
+
+        if args.duration:
+            args.count = None
+        report = run_load_test(args)
+
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+        summary = report["summary"]
+        print("\n📊 Итоги нагрузочного теста:")
+        print(f"   Обработано URL-ов: {summary['processed']} из {summary['total_urls']} "
+              f"(успешно: {summary['success_count']}, ошибок: {summary['error_count']})")
+        print(f"   Пакетов: {summary['batches']}, отложено: {summary['deferred_count']}")
+        print(f"   Время: {summary['duration']:.1f} с, {summary['urls_per_sec']} URL/с")
+        if summary['rss_peak_mb'] is not None:
+            print(f"   RSS: {summary['rss_start_mb']:.1f} -> пик {summary['rss_peak_mb']:.1f} МБ "
+                  f"(рост {summary['rss_growth_mb']:+.1f} МБ)")
+        print(f"   Обновлений токена: {summary['token_refreshes']}")
+        print(f"   Ответы мока по пакетам: {summary['server']['batch_status']}")
+        print(f"📄 Отчет сохранен в {args.report}")
+
+        failed = False
+        if args.min_throughput is not None and summary['urls_per_sec'] < args.min_throughput:
+            print(f"❌ Пропускная способность ниже {args.min_throughput} URL/с")
+            failed = True
+        if args.max_rss_growth is not None and (summary['rss_growth_mb'] or 0) > args.max_rss_growth:
+            print(f"❌ Рост RSS больше {args.max_rss_growth} МБ")
+            failed = True
+        if failed:
+            sys.exit(1)
+
+    except Exception as e:
+        print(f"❌ Ошибка: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
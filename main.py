@@ -9,25 +9,43 @@ import os
 import sys
 import time
 import logging
-from typing import List, Dict, Optional, Tuple
+from typing import Dict, List, Optional, Tuple
 from pathlib import Path
 import argparse
 from datetime import datetime
 from urllib.parse import urlparse
 
 try:
-    import requests
-    from google.oauth2 import service_account
-    from google.auth.transport.requests import Request
+    from credentials_provider import get_access_token, get_credentials, get_session, load_account_info
 except ImportError as e:
     print(f"Ошибка импорта: {e}")
     print("Установите зависимости: pip install google-auth google-auth-oauthlib google-auth-httplib2 requests")
     sys.exit(1)
 
+from adaptive_batching import AdaptiveBatchSizer
+from change_detection import DEFAULT_HASH_STORE, ChangeDetector, HashStore
+from circuit_breaker import DEFAULT_JOURNAL, CircuitBreakers, DeferralJournal, is_journal, start_replay
+from coordination import DEFAULT_DEDUPE_WINDOW, Coordinator, create_backend
+from indexing_batch import (BATCH_ENDPOINT, MAX_BATCH_SIZE, build_batch_request, failed_url_results,
+                            parse_batch_response)
+from indexing_logging import batch_context, new_batch_id, setup_logging
+from progress import ProgressTracker, format_duration
+from report_history import DEFAULT_HISTORY_DB, HistoryStore, RunRecorder
+from url_sources import MmapTextSource, SourceReader, UrlSource, create_source, shard_range
+
 
 class GoogleIndexingBulk:
     """Класс для работы с Google Indexing API"""
     
+    # Эндпоинт и паузы вынесены в атрибуты класса (нагрузочный тест подменяет их)
+    batch_endpoint = BATCH_ENDPOINT
+    batch_delay = 2
+    retry_delay = 5
+    
+    # Сколько последних пакетов хранить в результатах: результаты по URL-ам
+    # передаются потребителям сразу после пакета и в памяти не копятся
+    kept_batches = 20
+    
     def __init__(self, service_account_path: str = "service_account.json"):
         """
         Инициализация с файлом сервисного аккаунта
@@ -43,54 +61,47 @@ class GoogleIndexingBulk:
         if not self.service_account_path.exists():
             raise FileNotFoundError(f"Файл {service_account_path} не найден!")
         
-        self._authenticate()
         self._setup_logging()
+        self._authenticate()
     
     def _setup_logging(self):
         """Настройка логирования"""
-        logging.basicConfig(
-            level=logging.INFO,
-            format='%(asctime)s - %(levelname)s - %(message)s',
-            handlers=[
-                logging.FileHandler('indexing.log'),
-                logging.StreamHandler()
-            ]
-        )
-        self.logger = logging.getLogger(__name__)
+        self.logger = setup_logging()
     
     def _authenticate(self):
         """Аутентификация через сервисный аккаунт"""
         try:
-            # Загружаем учетные данные из файла
-            with open(self.service_account_path, 'r') as f:
-                service_account_data = json.load(f)
+            # Учетные данные берем из общего кэша процесса
+            service_account_data = load_account_info(str(self.service_account_path))
             
             self.service_account_email = service_account_data.get('client_email')
             if not self.service_account_email:
                 raise ValueError("Email сервисного аккаунта не найден в JSON файле")
             
-            self.credentials = service_account.Credentials.from_service_account_file(
-                self.service_account_path,
-                scopes=['https://www.googleapis.com/auth/indexing']
-            )
-            
             # Получаем токен доступа
-            self.credentials.refresh(Request())
+            self.credentials = get_credentials(str(self.service_account_path))
             self.access_token = self.credentials.token
             
             print("✅ Аутентификация успешна!")
             print(f"📧 Сервисный аккаунт: {self.service_account_email}")
+            self.logger.info("Аутентификация успешна", extra={"service_account": self.service_account_email})
             
         except Exception as e:
             print(f"❌ Ошибка аутентификации: {e}")
+            self.logger.error("Ошибка аутентификации: %s", e)
             raise
     
-    def check_domain_ownership(self, urls: List[str]) -> Dict[str, List[str]]:
+    def _get_access_token(self) -> str:
+        """Действующий токен доступа"""
+        return get_access_token(str(self.service_account_path))
+    
+    def check_domain_ownership(self, urls: List[str], announced: Optional[set] = None) -> Dict[str, List[str]]:
         """
         Проверка владения доменами
         
         Args:
             urls: Список URL-ов для проверки
+            announced: Уже показанные домены (при потоковой отправке выводятся только новые, множество пополняется)
         
         Returns:
             Словарь с доменами и их статусом
@@ -102,15 +113,32 @@ class GoogleIndexingBulk:
                 domains[domain] = []
             domains[domain].append(url)
         
-        print(f"\n🔍 Проверяем владение доменами...")
-        print(f"📧 Убедитесь, что {self.service_account_email} добавлен как владелец в Search Console для:")
+        new_domains = [domain for domain in domains if not announced or domain not in announced]
+        if not new_domains:
+            return domains
+        
+        if announced:
+            print(f"🔍 Новые домены: убедитесь, что {self.service_account_email} добавлен как владелец для:")
+        else:
+            print(f"\n🔍 Проверяем владение доменами...")
+            print(f"📧 Убедитесь, что {self.service_account_email} добавлен как владелец в Search Console для:")
         
-        for domain in domains:
+        for domain in new_domains:
             print(f"   - {domain}")
         
+        if announced is not None:
+            announced.update(new_domains)
+        
         return domains
     
-    def submit_urls(self, urls: List[str], batch_size: int = 100, max_retries: int = 3) -> Dict:
+    def submit_urls(self, urls: List[str], batch_size: int = 100, max_retries: int = 3,
+                    batch_sizer: Optional[AdaptiveBatchSizer] = None,
+                    coordinator: Optional[Coordinator] = None,
+                    breakers: Optional[CircuitBreakers] = None,
+                    tracker: Optional[ProgressTracker] = None,
+                    detector: Optional[ChangeDetector] = None,
+                    history: Optional[HistoryStore] = None,
+                    failed_journal: Optional[DeferralJournal] = None) -> Dict:
         """
         Отправка URL-ов в Google Indexing API
         
@@ -118,6 +146,13 @@ class GoogleIndexingBulk:
             urls: Список URL-ов для отправки
             batch_size: Размер пакета (максимум 100)
             max_retries: Максимальное количество попыток
+            batch_sizer: Адаптивный контроллер размера пакета (вместо фиксированного batch_size)
+            coordinator: Координатор аренды URL-ов и общей квоты между хостами
+            breakers: Выключатели доменов (URL-ы разомкнутых откладываются в журнал) и эндпоинта (пауза)
+            tracker: Учет прогресса (скорость, ETA, файл состояния)
+            detector: Запоминание состояния опубликованных страниц (отбор выполнен заранее)
+            history: База истории (результаты по URL-ам пишутся после каждого пакета)
+            failed_journal: Журнал, в который возвращаются неотправленные URL-ы (повторная отправка журнала)
         
         Returns:
             Словарь с результатами отправки
@@ -129,43 +164,295 @@ class GoogleIndexingBulk:
         self.check_domain_ownership(urls)
         
         # Ограничиваем размер пакета
-        batch_size = min(batch_size, 100)
+        batch_size = min(batch_size, MAX_BATCH_SIZE)
+        
+        results = self._new_results(len(urls))
+        tracker = tracker or ProgressTracker()
+        tracker.add_urls(urls, final=True)
+        run = history.start_run(results) if history else None
+        
+        total_batches = (len(urls) + batch_size - 1) // batch_size
+        if batch_sizer:
+            print(f"\n📦 Отправляем {len(urls)} URL-ов адаптивными пакетами...")
+        else:
+            print(f"\n📦 Отправляем {len(urls)} URL-ов в {total_batches} пакетах...")
+        
+        position = 0
+        while position < len(urls):
+            size = batch_sizer.next_size(len(urls) - position) if batch_sizer else batch_size
+            if size <= 0:
+                results["quota_skipped"] = len(urls) - position
+                print(f"   ⚠️  Квота исчерпана, пропущено {results['quota_skipped']} URL-ов")
+                break
+            
+            if coordinator and coordinator.quota_exhausted:
+                results["quota_skipped"] = coordinator.stats["quota_denied"] + len(urls) - position
+                print(f"   ⚠️  Общая квота исчерпана, пропущено {results['quota_skipped']} URL-ов")
+                break
+            
+            batch = urls[position:position + size]
+            position += len(batch)
+            
+            progress = "" if batch_sizer else f"/{total_batches}"
+            sent = self._send_batch(batch, results, tracker, max_retries, batch_sizer, coordinator, breakers,
+                                    progress, detector, run, failed_journal)
+            
+            # Небольшая пауза между пакетами
+            if sent and position < len(urls):
+                time.sleep(self.batch_delay)
         
-        results = {
-            "total_urls": len(urls),
+        self._finish_results(results, tracker, coordinator, breakers, run)
+        
+        return results
+    
+    def submit_source(self, source: UrlSource, batch_size: int = 100, max_retries: int = 3,
+                      batch_sizer: Optional[AdaptiveBatchSizer] = None,
+                      coordinator: Optional[Coordinator] = None,
+                      breakers: Optional[CircuitBreakers] = None,
+                      detector: Optional[ChangeDetector] = None,
+                      queue_size: int = 10000, flush_timeout: float = 1.0,
+                      tracker: Optional[ProgressTracker] = None,
+                      history: Optional[HistoryStore] = None,
+                      failed_journal: Optional[DeferralJournal] = None) -> Dict:
+        """
+        Потоковая отправка URL-ов из источника через ограниченную очередь
+        
+        Args:
+            source: Источник URL-ов
+            batch_size: Размер пакета (максимум 100)
+            max_retries: Максимальное количество попыток
+            batch_sizer: Адаптивный контроллер размера пакета
+            coordinator: Координатор аренды URL-ов и общей квоты между хостами
+            breakers: Выключатели доменов (URL-ы разомкнутых откладываются в журнал) и эндпоинта (пауза)
+            detector: Отбор изменившихся URL-ов (метаданные источника учитываются)
+            queue_size: Максимум прочитанных, но не отправленных URL-ов
+            flush_timeout: Через сколько секунд ожидания источника отправлять неполный пакет
+            tracker: Учет прогресса (скорость, ETA, файл состояния)
+            history: База истории (результаты по URL-ам пишутся после каждого пакета)
+            failed_journal: Журнал, в который возвращаются неотправленные URL-ы (повторная отправка журнала)
+        
+        Returns:
+            Словарь с результатами отправки
+        """
+        batch_size = min(batch_size, MAX_BATCH_SIZE)
+        results = self._new_results(0)
+        tracker = tracker or ProgressTracker()
+        run = history.start_run(results) if history else None
+        
+        def next_size() -> int:
+            if coordinator and coordinator.quota_exhausted:
+                return 0
+            return batch_sizer.next_size(MAX_BATCH_SIZE) if batch_sizer else batch_size
+        
+        print(f"\n📦 Отправляем URL-ы из источника (очередь до {queue_size} URL-ов)...")
+        
+        # Смещения есть только у текстового файла: по ним запуск продолжается с первого неотправленного URL-а
+        tracks_offsets = isinstance(source, MmapTextSource) and source.track_offsets
+        offset = getattr(source, "start", 0)
+        pending = []  # Изменившиеся URL-ы, ожидающие добора пакета: (url, смещение начала строки)
+        unsent = []  # Смещения URL-ов, не отправленных из-за общей квоты
+        announced = set()  # Домены, для которых уже показано напоминание о владении
+        last_sent = None
+        
+        def send(entries: List[Tuple[str, int]]):
+            nonlocal last_sent
+            # Пауза между пакетами выдерживается перед следующим пакетом (время ожидания
+            # источника в нее засчитывается), после последнего пакета паузы нет
+            if last_sent is not None:
+                time.sleep(max(0.0, last_sent + self.batch_delay - time.monotonic()))
+            urls = [url for url, _ in entries]
+            self.check_domain_ownership(urls, announced)
+            if self._send_batch(urls, results, tracker, max_retries, batch_sizer, coordinator, breakers,
+                                detector=detector, run=run, failed_journal=failed_journal):
+                last_sent = time.monotonic()
+            if coordinator and coordinator.quota_denied_urls:
+                denied = set(coordinator.quota_denied_urls)
+                unsent.extend(start for url, start in entries if url in denied)
+        
+        def flush(partial: bool):
+            # Полные пакеты из накопленных URL-ов; неполный - только если источник ждет или закончился
+            while pending and next_size() > 0 and (partial or len(pending) >= next_size()):
+                size = next_size()
+                send(pending[:size])
+                del pending[:size]
+        
+        reader = SourceReader(source, maxsize=queue_size)
+        for items in reader.iter_batches(next_size, flush_timeout):
+            results["total_urls"] += len(items)
+            tracker.add_urls(url for url, _ in items)
+            
+            entries = []
+            for url, metadata in items:
+                entries.append((url, offset))
+                if tracks_offsets:
+                    offset = metadata["offset"]
+            if tracks_offsets:
+                tracker.read_fraction = source.fraction(offset)
+            
+            if not detector:
+                send(entries)
+                continue
+            
+            # Отбор идет до сборки пакета: изменившиеся URL-ы нескольких прочитанных
+            # пакетов отправляются одним полным пакетом, а не обрывками
+            changed = set(detector.detect([url for url, _ in items], dict(items)))
+            tracker.skip(len(items) - len(changed))
+            pending.extend(entry for entry in entries if entry[0] in changed)
+            flush(partial=len(items) < next_size())
+        
+        flush(partial=True)
+        
+        if tracks_offsets:
+            unsent.extend(start for _, start in pending)
+            results["source_offset"] = min(unsent) if unsent else offset
+        
+        if next_size() <= 0:
+            results["quota_exhausted"] = True
+            print("   ⚠️  Квота исчерпана, отправка остановлена")
+            if "source_offset" in results:
+                print(f"   Для продолжения запустите с --start-offset {results['source_offset']}")
+        results["invalid_urls"] = source.invalid_count
+        tracker.total_known = True
+        
+        self._finish_results(results, tracker, coordinator, breakers, run)
+        
+        return results
+    
+    def _new_results(self, total_urls: int) -> Dict:
+        """Пустой словарь результатов запуска"""
+        return {
+            "total_urls": total_urls,
             "batches": [],
+            "batch_count": 0,
+            "submitted": 0,
             "success_count": 0,
             "error_count": 0,
             "errors": [],
             "domain_stats": {},
+            "service_account": self.service_account_email,
             "timestamp": datetime.now().isoformat()
         }
+    
+    def _finish_results(self, results: Dict, tracker: ProgressTracker, coordinator: Optional[Coordinator],
+                        breakers: Optional[CircuitBreakers], run: Optional[RunRecorder] = None):
+        """Итоговая статистика запуска"""
+        tracker.finish()
+        results["finished_at"] = datetime.now().isoformat()
+        results["duration"] = round(tracker.elapsed, 3)
+        results["urls_per_sec"] = round(tracker.processed / tracker.elapsed, 2) if tracker.elapsed else 0.0
+        
+        if coordinator:
+            results["coordination"] = dict(coordinator.stats, worker_id=coordinator.worker_id)
+        if breakers:
+            results["deferred_count"] = breakers.journal.count
+            results["open_circuits"] = breakers.open_circuits()
         
-        # Разбиваем на пакеты
-        batches = [urls[i:i + batch_size] for i in range(0, len(urls), batch_size)]
+        # Статистика по доменам и типам ошибок накоплена по ходу отправки
+        results["domain_stats"] = tracker.domains
+        results["error_types"] = tracker.error_types
+        
+        if run:
+            run.finish(results)
+    
+    def _send_batch(self, batch: List[str], results: Dict, tracker: ProgressTracker, max_retries: int,
+                    batch_sizer: Optional[AdaptiveBatchSizer] = None,
+                    coordinator: Optional[Coordinator] = None,
+                    breakers: Optional[CircuitBreakers] = None, progress: str = "",
+                    detector: Optional[ChangeDetector] = None, run: Optional[RunRecorder] = None,
+                    failed_journal: Optional[DeferralJournal] = None) -> bool:
+        """
+        Отправка одного пакета с учетом результатов
         
-        print(f"\n📦 Отправляем {len(urls)} URL-ов в {len(batches)} пакетах...")
+        Args:
+            batch: URL-ы пакета
+            results: Результаты запуска (обновляются)
+            tracker: Учет прогресса
+            max_retries: Максимальное количество попыток
+            batch_sizer: Адаптивный контроллер размера пакета
+            coordinator: Координатор аренды URL-ов
+            breakers: Выключатели доменов и эндпоинта
+            progress: Суффикс номера пакета для вывода (например "/12")
+            detector: Запоминание состояния опубликованных страниц
+            run: Запись запуска в базу истории
+            failed_journal: Журнал для URL-ов, которые не удалось отправить
         
-        for i, batch in enumerate(batches, 1):
-            print(f"   Пакет {i}/{len(batches)} ({len(batch)} URL-ов)...")
+        Returns:
+            True, если пакет был отправлен
+        """
+        # При сбое эндпоинта ждем пробного пакета, URL-ы доменов с разомкнутым
+        # выключателем откладываем в журнал
+        if breakers:
+            pause = breakers.endpoint.retry_after()
+            if pause:
+                print(f"   ⏸️  Эндпоинт недоступен, пауза {format_duration(pause)} до пробного пакета")
+            breakers.wait_endpoint()
             
+            allowed = breakers.filter(batch)
+            tracker.skip(len(batch) - len(allowed))
+            batch = allowed
+            if not batch:
+                return False
+        
+        # Берем аренду: URL-ы других хостов и уже опубликованные пропускаем
+        if coordinator:
+            claimed = coordinator.claim(batch)
+            tracker.skip(len(batch) - len(claimed))
+            batch = claimed
+            if not batch:
+                return False
+        
+        with batch_context(new_batch_id()) as batch_id:
             batch_result = self._submit_batch_with_retry(batch, max_retries)
-            results["batches"].append(batch_result)
-            
-            if batch_result["success"]:
-                results["success_count"] += len(batch)
-            else:
-                results["error_count"] += len(batch)
-                results["errors"].extend(batch_result.get("errors", []))
-            
-            # Небольшая пауза между пакетами
-            if i < len(batches):
-                time.sleep(2)
+            batch_result["batch_id"] = batch_id
+            self.logger.info(
+                "Пакет отправлен" if batch_result["success"] else "Ошибка отправки пакета",
+                extra={
+                    "urls_count": len(batch),
+                    "status_code": batch_result.get("status_code"),
+                    "elapsed": batch_result.get("elapsed"),
+                    "success": batch_result["success"]
+                }
+            )
+        results["batch_count"] += 1
+        results["submitted"] += len(batch)
         
-        # Анализируем статистику по доменам
-        results["domain_stats"] = self._analyze_domain_stats(urls, results)
+        if batch_sizer:
+            batch_sizer.record(batch_result)
         
-        return results
+        # Итоги считаем по каждому URL-у: пакет может быть принят частично
+        url_results = batch_result.pop("url_results", None) or failed_url_results(batch, batch_result)
+        
+        if breakers:
+            breakers.record(batch_result, url_results)
+        batch_success = sum(1 for url_result in url_results if url_result["success"])
+        results["success_count"] += batch_success
+        results["error_count"] += len(batch) - batch_success
+        if batch_result.get("error"):
+            results["errors"].append(batch_result["error"])
+            del results["errors"][:-self.kept_batches]
+        
+        tracker.record(url_results)
+        print(f"   Пакет {results['batch_count']}{progress} ({len(batch)} URL-ов): "
+              f"✅ {batch_success} ❌ {len(batch) - batch_success} | {tracker.format_line()}")
+        
+        if coordinator:
+            coordinator.finish(url_results)
+        if detector:
+            detector.commit(url_results)
+        if run:
+            run.record(url_results)
+        if failed_journal:
+            failed_journal.append([
+                (url_result["url"], f"failed:{url_result.get('status_code') or 'network'}")
+                for url_result in url_results if not url_result["success"]
+            ])
+        
+        # Результаты по URL-ам уже переданы потребителям - храним только сводку последних пакетов
+        batch_result["success_count"] = batch_success
+        results["batches"].append(batch_result)
+        del results["batches"][:-self.kept_batches]
+        
+        return True
     
     def _submit_batch_with_retry(self, urls: List[str], max_retries: int) -> Dict:
         """
@@ -188,8 +475,9 @@ class GoogleIndexingBulk:
                 # Проверяем, стоит ли повторять
                 if "403" in result.get("error", "") and "ownership" in result.get("error", "").lower():
                     print(f"   ⚠️  Ошибка прав доступа (попытка {attempt + 1}/{max_retries})")
+                    self.logger.warning("Ошибка прав доступа (попытка %d/%d)", attempt + 1, max_retries)
                     if attempt < max_retries - 1:
-                        time.sleep(5 * (attempt + 1))  # Увеличиваем задержку
+                        time.sleep(self.retry_delay * (attempt + 1))  # Увеличиваем задержку
                         continue
                 
                 return result
@@ -197,9 +485,10 @@ class GoogleIndexingBulk:
             except Exception as e:
                 error_msg = f"Ошибка в попытке {attempt + 1}: {e}"
                 print(f"   ❌ {error_msg}")
+                self.logger.warning(error_msg)
                 
                 if attempt < max_retries - 1:
-                    time.sleep(5 * (attempt + 1))
+                    time.sleep(self.retry_delay * (attempt + 1))
                     continue
                 
                 return {
@@ -224,110 +513,47 @@ class GoogleIndexingBulk:
         Returns:
             Результат отправки пакета
         """
-        # Формируем multipart данные
-        boundary = f"batch_{int(time.time())}"
-        headers = {
-            'Content-Type': f'multipart/mixed; boundary={boundary}',
-            'Authorization': f'Bearer {self.access_token}'
-        }
-        
-        body_parts = []
-        
-        for url in urls:
-            # Формируем часть для каждого URL
-            part_boundary = f"--{boundary}"
-            content_id = f"<{int(time.time() * 1000)}>"
-            
-            # HTTP заголовки
-            http_headers = (
-                f"POST /v3/urlNotifications:publish HTTP/1.1\r\n"
-                f"Content-Type: application/json\r\n"
-                f"Content-Length: {len(json.dumps({'url': url, 'type': 'URL_UPDATED'}))}\r\n\r\n"
-            )
-            
-            # JSON данные
-            json_data = json.dumps({
-                'url': url,
-                'type': 'URL_UPDATED'
-            })
-            
-            # Собираем часть
-            part = (
-                f"{part_boundary}\r\n"
-                f"Content-Type: application/http\r\n"
-                f"Content-ID: {content_id}\r\n\r\n"
-                f"{http_headers}"
-                f"{json_data}\r\n"
-            )
-            
-            body_parts.append(part)
-        
-        # Закрывающая граница
-        body_parts.append(f"--{boundary}--")
-        
-        # Собираем тело запроса
-        body = "\r\n".join(body_parts)
+        started = time.monotonic()
         
         try:
-            response = requests.post(
-                'https://indexing.googleapis.com/batch',
+            # Токен обновляется только при истечении (долгие запуски дольше часа)
+            self.access_token = self._get_access_token()
+            headers, body = build_batch_request(urls, self.access_token)
+            
+            response = get_session().post(
+                self.batch_endpoint,
                 headers=headers,
-                data=body.encode('utf-8'),
+                data=body,
                 timeout=30
             )
+            elapsed = time.monotonic() - started
             
             if response.status_code == 200:
                 return {
                     "success": True,
                     "urls_count": len(urls),
-                    "response": response.text,
-                    "status_code": response.status_code
+                    "status_code": response.status_code,
+                    "elapsed": elapsed,
+                    "url_results": parse_batch_response(
+                        urls, response.headers.get('Content-Type', ''), response.text
+                    )
                 }
             else:
                 return {
                     "success": False,
                     "urls_count": len(urls),
                     "error": f"HTTP {response.status_code}: {response.text}",
-                    "status_code": response.status_code
+                    "status_code": response.status_code,
+                    "elapsed": elapsed
                 }
                 
         except Exception as e:
             return {
                 "success": False,
                 "urls_count": len(urls),
-                "error": str(e)
+                "error": str(e),
+                "elapsed": time.monotonic() - started
             }
-    
-    def _analyze_domain_stats(self, urls: List[str], results: Dict) -> Dict:
-        """
-        Анализ статистики по доменам
-        
-        Args:
-            urls: Список URL-ов
-            results: Результаты отправки
-        
-        Returns:
-            Статистика по доменам
-        """
-        domain_stats = {}
-        
-        for url in urls:
-            domain = urlparse(url).netloc
-            if domain not in domain_stats:
-                domain_stats[domain] = {
-                    "total_urls": 0,
-                    "success_count": 0,
-                    "error_count": 0
-                }
-            domain_stats[domain]["total_urls"] += 1
-        
-        # Анализируем ошибки по доменам
-        for batch in results["batches"]:
-            if not batch["success"]:
-                # Это упрощенный анализ - в реальности нужно парсить batch response
-                pass
-        
-        return domain_stats
 
 
 def load_urls_from_file(file_path: str) -> List[str]:
@@ -345,25 +571,16 @@ def load_urls_from_file(file_path: str) -> List[str]:
     if not file_path.exists():
         raise FileNotFoundError(f"Файл {file_path} не найден!")
     
-    with open(file_path, 'r', encoding='utf-8') as f:
-        urls = [line.strip() for line in f if line.strip()]
+    # Строки и схема проверяются на байтах через mmap, без построчного чтения
+    source = MmapTextSource(str(file_path), track_offsets=False)
+    valid_urls = [url for url, _ in source]
     
-    # Валидация URL-ов
-    valid_urls = []
-    invalid_urls = []
-    
-    for url in urls:
-        if url.startswith(('http://', 'https://')):
-            valid_urls.append(url)
-        else:
-            invalid_urls.append(url)
-    
-    if invalid_urls:
-        print(f"⚠️  Найдено {len(invalid_urls)} некорректных URL-ов:")
-        for url in invalid_urls[:5]:  # Показываем первые 5
+    if source.invalid_count:
+        print(f"⚠️  Найдено {source.invalid_count} некорректных URL-ов:")
+        for url in source.invalid_samples:  # Показываем первые 5
             print(f"   {url}")
-        if len(invalid_urls) > 5:
-            print(f"   ... и еще {len(invalid_urls) - 5}")
+        if source.invalid_count > len(source.invalid_samples):
+            print(f"   ... и еще {source.invalid_count - len(source.invalid_samples)}")
     
     return valid_urls
 
@@ -399,28 +616,26 @@ def print_detailed_results(results: Dict):
     print(f"Всего URL-ов: {results['total_urls']}")
     print(f"Успешно отправлено: {results['success_count']}")
     print(f"Ошибок: {results['error_count']}")
-    print(f"Пакетов: {len(results['batches'])}")
-    print(f"Время выполнения: {results.get('timestamp', 'N/A')}")
+    if results.get('deferred_count'):
+        print(f"Отложено в журнал: {results['deferred_count']}")
+    print(f"Пакетов: {results.get('batch_count', len(results['batches']))}")
+    print(f"Начало: {results.get('timestamp', 'N/A')}")
+    if 'duration' in results:
+        print(f"Время выполнения: {format_duration(results['duration'])} "
+              f"({results.get('urls_per_sec', 0)} URL/с)")
     
     # Статистика по доменам
     if results.get('domain_stats'):
         print(f"\n🌐 Статистика по доменам:")
         for domain, stats in results['domain_stats'].items():
-            print(f"   {domain}: {stats['total_urls']} URL-ов")
+            print(f"   {domain}: {stats['total_urls']} URL-ов "
+                  f"(успешно: {stats['success_count']}, ошибок: {stats['error_count']})")
     
     # Анализ ошибок
-    if results['errors']:
+    error_types = results.get('error_types', {})
+    if error_types:
         print(f"\n❌ Основные ошибки:")
-        error_types = {}
-        for error in results['errors']:
-            if "403" in error and "ownership" in error.lower():
-                error_types["Права доступа"] = error_types.get("Права доступа", 0) + 1
-            elif "429" in error:
-                error_types["Превышен лимит"] = error_types.get("Превышен лимит", 0) + 1
-            else:
-                error_types["Другие ошибки"] = error_types.get("Другие ошибки", 0) + 1
-        
-        for error_type, count in error_types.items():
+        for error_type, count in sorted(error_types.items(), key=lambda item: -item[1]):
             print(f"   {error_type}: {count}")
     
     # Рекомендации
@@ -445,12 +660,74 @@ def main():
   python main.py urls.txt --service-account my_account.json
   python main.py urls.txt --save-results
   python main.py urls.txt --max-retries 5
+  python main.py urls.txt --only-changed
+  python main.py urls.txt --adaptive-batch --daily-quota 200
+  python main.py pages.csv.gz --only-changed
+  cat urls.txt | python main.py -
+  python main.py urls.txt --shard 2/4
+  python main.py sqlite:///pages.db --query "SELECT url, etag FROM pages"
+  python main.py urls.txt --circuit-breaker
+  python main.py urls.txt --status-file status.json
+  python main.py urls.txt --coordination sqlite:////mnt/shared/coordination.db --daily-quota 200
         """
     )
     
     parser.add_argument(
         'urls_file',
-        help='Файл с URL-ами (по одному на строку)'
+        help='Файл с URL-ами (по одному на строку); также CSV/JSONL, .gz/.zst, '
+             '"-" для stdin или sqlite:///база.db вместе с --query'
+    )
+    
+    parser.add_argument(
+        '--source',
+        choices=['auto', 'text', 'csv', 'jsonl', 'stdin', 'db'],
+        default='auto',
+        help='Тип источника URL-ов (по умолчанию: auto - по расширению файла)'
+    )
+    
+    parser.add_argument(
+        '--query',
+        help='SQL запрос для источника db (первая колонка - URL, остальные - метаданные)'
+    )
+    
+    parser.add_argument(
+        '--stream',
+        action='store_true',
+        default=True,
+        help='Ничего не меняет, оставлен для совместимости: потоковая отправка включена по умолчанию'
+    )
+    
+    parser.add_argument(
+        '--no-stream',
+        dest='stream',
+        action='store_false',
+        help='Загрузить весь текстовый файл в память перед отправкой '
+             '(для остальных источников и при --start-offset/--end-offset/--shard не действует)'
+    )
+    
+    parser.add_argument(
+        '--start-offset',
+        type=int,
+        default=0,
+        help='Байтовое смещение в текстовом файле, с которого начать (для продолжения прерванного запуска)'
+    )
+    
+    parser.add_argument(
+        '--end-offset',
+        type=int,
+        help='Байтовое смещение в текстовом файле, на котором остановиться'
+    )
+    
+    parser.add_argument(
+        '--shard',
+        help='Обработать только часть текстового файла: НОМЕР/ВСЕГО, например 2/4'
+    )
+    
+    parser.add_argument(
+        '--queue-size',
+        type=int,
+        default=10000,
+        help='Максимум прочитанных, но еще не отправленных URL-ов при потоковой отправке (по умолчанию: 10000)'
     )
     
     parser.add_argument(
@@ -484,6 +761,113 @@ def main():
         help='Имя файла для сохранения результатов'
     )
     
+    parser.add_argument(
+        '--adaptive-batch',
+        action='store_true',
+        help='Подбирать размер пакета по задержке и ошибкам (--batch-size задает начальный размер)'
+    )
+    
+    parser.add_argument(
+        '--daily-quota',
+        type=int,
+        help='Оставшаяся квота запросов на сегодня (отправка остановится при ее исчерпании)'
+    )
+    
+    parser.add_argument(
+        '--coordination',
+        help='Общее хранилище для нескольких хостов: sqlite:////абсолютный/путь/coordination.db '
+             '(аренда URL-ов и общая --daily-quota на аккаунт)'
+    )
+    
+    parser.add_argument(
+        '--worker-id',
+        help='Идентификатор воркера для --coordination (по умолчанию: хост:PID)'
+    )
+    
+    parser.add_argument(
+        '--lease-ttl',
+        type=int,
+        default=600,
+        help='Время жизни аренды URL-а в секундах (по умолчанию: 600)'
+    )
+    
+    parser.add_argument(
+        '--dedupe-window',
+        type=int,
+        default=DEFAULT_DEDUPE_WINDOW,
+        help='Не отправлять повторно URL-ы, опубликованные любым хостом за последние N секунд '
+             f'(только с --coordination; по умолчанию: {DEFAULT_DEDUPE_WINDOW} - сутки, '
+             '0 - разрешить повторную отправку)'
+    )
+    
+    parser.add_argument(
+        '--circuit-breaker',
+        action='store_true',
+        help='Откладывать URL-ы доменов с повторными 403 в журнал и приостанавливать отправку при сбоях эндпоинта'
+    )
+    
+    parser.add_argument(
+        '--journal-file',
+        default=DEFAULT_JOURNAL,
+        help=f'Журнал отложенных URL-ов для --circuit-breaker (по умолчанию: {DEFAULT_JOURNAL})'
+    )
+    
+    parser.add_argument(
+        '--only-changed',
+        action='store_true',
+        help='Отправлять только URL-ы, содержимое которых изменилось с последней публикации'
+    )
+    
+    parser.add_argument(
+        '--hash-store',
+        default=DEFAULT_HASH_STORE,
+        help=f'Файл базы состояний для --only-changed (по умолчанию: {DEFAULT_HASH_STORE})'
+    )
+    
+    parser.add_argument(
+        '--fetch-workers',
+        type=int,
+        default=16,
+        help='Количество параллельных запросов к страницам для --only-changed (по умолчанию: 16)'
+    )
+    
+    parser.add_argument(
+        '--history-db',
+        default=DEFAULT_HISTORY_DB,
+        help=f'База истории запусков для report_history.py (по умолчанию: {DEFAULT_HISTORY_DB})'
+    )
+    
+    parser.add_argument(
+        '--no-history',
+        action='store_true',
+        help='Не записывать запуск в базу истории'
+    )
+    
+    parser.add_argument(
+        '--status-file',
+        help='JSON файл с текущим прогрессом для дашбордов (скорость, ETA, счетчики по доменам)'
+    )
+    
+    parser.add_argument(
+        '--status-interval',
+        type=float,
+        default=5,
+        help='Как часто обновлять --status-file, в секундах (по умолчанию: 5)'
+    )
+    
+    parser.add_argument(
+        '--log-format',
+        choices=['text', 'json'],
+        default='text',
+        help='Формат файла лога: text или json (JSON lines) (по умолчанию: text)'
+    )
+    
+    parser.add_argument(
+        '--log-file',
+        default='indexing.log',
+        help='Путь к файлу лога (по умолчанию: indexing.log)'
+    )
+    
     parser.add_argument(
         '--verbose',
         action='store_true',
@@ -492,23 +876,151 @@ def main():
     
     args = parser.parse_args()
     
+    setup_logging(
+        log_file=args.log_file,
+        json_format=args.log_format == 'json',
+        console_level=logging.INFO if args.verbose else logging.WARNING
+    )
+    
     try:
-        # Загружаем URL-ы
-        print(f"📁 Загружаем URL-ы из {args.urls_file}...")
-        urls = load_urls_from_file(args.urls_file)
+        urls_file = args.urls_file
         
-        if not urls:
-            print("❌ Не найдено валидных URL-ов!")
-            return
+        # Повторная отправка журнала: читаем перенесенную копию, чтобы снова
+        # отложенные URL-ы не дописывались в читаемый файл
+        replay_path = None
+        if is_journal(urls_file, args.journal_file):
+            replay_path = urls_file = start_replay(args.journal_file)
+            print(f"♻️  Журнал перенесен в {replay_path}, новые отложенные URL-ы пишутся в {args.journal_file}")
+        
+        start_offset, end_offset = args.start_offset, args.end_offset
+        if args.shard:
+            shard, shards = (int(part) for part in args.shard.split('/'))
+            start_offset, end_offset = shard_range(urls_file, shard, shards)
+            print(f"🧩 Шард {shard}/{shards}: байты {start_offset}-{end_offset}")
+        
+        source = create_source(urls_file, args.source, args.query, start_offset, end_offset)
+        streaming = args.stream or not isinstance(source, MmapTextSource) \
+            or bool(start_offset) or end_offset is not None
+        
+        detector = None
+        if args.only_changed:
+            detector = ChangeDetector(HashStore(args.hash_store), max_workers=args.fetch_workers)
+        
+        if streaming:
+            print(f"📁 Читаем URL-ы из {urls_file} потоково...")
+            urls = None
+        else:
+            # Загружаем URL-ы
+            print(f"📁 Загружаем URL-ы из {urls_file}...")
+            urls = load_urls_from_file(urls_file)
+            
+            if not urls:
+                print("❌ Не найдено валидных URL-ов!")
+                return
+            
+            print(f"✅ Загружено {len(urls)} валидных URL-ов")
         
-        print(f"✅ Загружено {len(urls)} валидных URL-ов")
+        # Отбираем только изменившиеся страницы
+        if detector and not streaming:
+            print(f"🔎 Проверяем изменения страниц ({args.hash_store})...")
+            urls = detector.detect(urls)
+            print(f"   Изменилось: {detector.stats['changed']}, "
+                  f"без изменений: {detector.stats['unchanged']}, "
+                  f"ошибок проверки: {detector.stats['fetch_errors']}")
+            
+            if not urls:
+                print("✅ Изменившихся URL-ов нет, отправка не требуется")
+                return
         
         # Инициализируем API
         print("🔐 Инициализируем Google Indexing API...")
         api = GoogleIndexingBulk(args.service_account)
         
         # Отправляем URL-ы
-        results = api.submit_urls(urls, args.batch_size, args.max_retries)
+        # С --coordination квота общая для всех хостов и учитывается в хранилище
+        coordinator = None
+        local_quota = args.daily_quota
+        if args.coordination:
+            coordinator = Coordinator(
+                create_backend(args.coordination),
+                api.service_account_email,
+                worker_id=args.worker_id,
+                daily_limit=args.daily_quota,
+                lease_ttl=args.lease_ttl,
+                # Изменившиеся страницы нужно опубликовать заново, даже если их недавно отправляли
+                dedupe_window=0 if args.only_changed else args.dedupe_window
+            )
+            local_quota = None
+            print(f"🤝 Координация: {args.coordination} (воркер {coordinator.worker_id})")
+        
+        # Без --adaptive-batch размер фиксирован, контроллер только следит за квотой
+        batch_sizer = None
+        if args.adaptive_batch:
+            batch_sizer = AdaptiveBatchSizer(initial_size=args.batch_size, quota=local_quota)
+        elif local_quota is not None:
+            batch_sizer = AdaptiveBatchSizer(
+                initial_size=args.batch_size,
+                min_size=args.batch_size,
+                max_size=args.batch_size,
+                quota=local_quota
+            )
+        
+        breakers = CircuitBreakers(DeferralJournal(args.journal_file)) if args.circuit_breaker else None
+        
+        # ETA учитывает только локальную квоту: общую квоту хостов здесь не видно
+        tracker = ProgressTracker(
+            quota=local_quota, status_file=args.status_file, status_interval=args.status_interval
+        )
+        
+        # Запуск записывается в историю по мере отправки пакетов
+        history = None if args.no_history else HistoryStore(args.history_db)
+        
+        # При повторной отправке журнала неудачные URL-ы возвращаются в журнал
+        failed_journal = DeferralJournal(args.journal_file) if replay_path else None
+        
+        if streaming:
+            results = api.submit_source(
+                source, args.batch_size, args.max_retries, batch_sizer, coordinator, breakers,
+                detector=detector, queue_size=args.queue_size, tracker=tracker, history=history,
+                failed_journal=failed_journal
+            )
+            if results["invalid_urls"]:
+                print(f"⚠️  Пропущено некорректных URL-ов: {results['invalid_urls']}")
+            if detector:
+                print(f"🔎 Изменилось: {detector.stats['changed']}, "
+                      f"без изменений: {detector.stats['unchanged']}, "
+                      f"ошибок проверки: {detector.stats['fetch_errors']}")
+        else:
+            results = api.submit_urls(
+                urls, args.batch_size, args.max_retries, batch_sizer, coordinator, breakers, tracker,
+                detector=detector, history=history, failed_journal=failed_journal
+            )
+        
+        if history:
+            history.close()
+        
+        if breakers and breakers.journal.count:
+            print(f"⏸️  Отложено в журнал {breakers.journal.path}: {breakers.journal.count} URL-ов "
+                  f"(разомкнуто: {', '.join(results['open_circuits']) or '-'})")
+        
+        # Полностью обработанный журнал больше не нужен: повторный запуск отправил бы его снова,
+        # а неудачные URL-ы уже возвращены в журнал
+        if replay_path:
+            if failed_journal.count:
+                print(f"↩️  Не удалось отправить повторно, возвращено в {failed_journal.path}: "
+                      f"{failed_journal.count} URL-ов")
+            if results.get("quota_exhausted") or results.get("quota_skipped"):
+                print(f"   Журнал обработан не полностью, продолжите: python3 main.py {replay_path}")
+            else:
+                os.remove(replay_path)
+                print(f"🗑️  Журнал {replay_path} обработан и удален")
+        
+        if coordinator:
+            coordinator.backend.close()
+            print(f"   Пропущено (обрабатываются другими хостами): {coordinator.stats['leased_elsewhere']}")
+            if coordinator.stats['recently_published']:
+                print(f"   Пропущено (опубликованы за последние {coordinator.dedupe_window} с): "
+                      f"{coordinator.stats['recently_published']}")
         
         # Выводим детальные результаты
         print_detailed_results(results)
@@ -0,0 +1,225 @@
+"""
+Прогресс отправки: скорость, ETA и счетчики по доменам
+
+Счетчики обновляются после каждого пакета только по его результатам, без
+повторного просмотра уже отправленных пакетов. Скорость считается по
+скользящему окну реального времени, поэтому паузы между пакетами, повторы
+и замедление из-за 429 в ней уже учтены. Если задана квота, ETA считается
+только для URL-ов, которые в нее помещаются, остальные показываются отдельно.
+При потоковом чтении текстового файла общее количество URL-ов оценивается по
+доле уже прочитанных байтов.
+
+Состояние можно периодически записывать в JSON файл для дашбордов.
+"""
+
+import json
+import os
+import time
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Optional
+from urllib.parse import urlparse
+
+from indexing_batch import categorize_error
+
+DEFAULT_WINDOW = 60
+
+
+def format_duration(seconds: Optional[float]) -> str:
+    """Длительность в формате Ч:ММ:СС"""
+    if seconds is None:
+        return "—"
+    return str(timedelta(seconds=int(seconds)))
+
+
+class ProgressTracker:
+    """Инкрементальный учет прогресса запуска"""
+
+    def __init__(self, quota: Optional[int] = None, window: float = DEFAULT_WINDOW,
+                 status_file: Optional[str] = None, status_interval: float = 5):
+        """
+        Args:
+            quota: Оставшаяся квота запросов (None - без ограничения)
+            window: Окно расчета скорости в секундах
+            status_file: JSON файл состояния (None - не записывать)
+            status_interval: Минимальный интервал записи файла состояния в секундах
+        """
+        self.total = 0
+        self.total_known = False
+        self.read_fraction = None
+        self.quota = quota
+        self.window = window
+        self.status_file = status_file
+        self.status_interval = status_interval
+
+        self.started_at = datetime.now()
+        self.started = time.monotonic()
+        self.finished = None
+        self.submitted = 0
+        self.success_count = 0
+        self.error_count = 0
+        self.skipped = 0
+        self.batches = 0
+        self.domains = {}
+        self.error_types = {}
+
+        # Точки (время, обработано): самая старая лежит не позже начала окна
+        self._samples = deque([(self.started, 0)])
+        self._status_written = 0
+
+    @property
+    def processed(self) -> int:
+        """URL-ы, получившие результат"""
+        return self.success_count + self.error_count
+
+    def _domain(self, domain: str) -> Dict:
+        stats = self.domains.get(domain)
+        if stats is None:
+            stats = self.domains[domain] = {"total_urls": 0, "success_count": 0, "error_count": 0}
+        return stats
+
+    def add_urls(self, urls: Iterable[str], final: bool = False):
+        """
+        Учет URL-ов, поступивших в работу
+
+        Args:
+            urls: URL-ы
+            final: Больше URL-ов не будет (общее количество известно, ETA считается до конца)
+        """
+        for url in urls:
+            self._domain(urlparse(url).netloc)["total_urls"] += 1
+            self.total += 1
+        self.total_known = final
+
+    def skip(self, count: int):
+        """Учет URL-ов, которые не будут отправлены (отложены, у других хостов, без изменений)"""
+        self.skipped += count
+
+    def record(self, url_results: Iterable[Dict]):
+        """
+        Учет результатов одного пакета
+
+        Args:
+            url_results: Результаты по URL-ам пакета
+        """
+        for url_result in url_results:
+            stats = self._domain(urlparse(url_result["url"]).netloc)
+            self.submitted += 1
+            if url_result["success"]:
+                self.success_count += 1
+                stats["success_count"] += 1
+            else:
+                self.error_count += 1
+                stats["error_count"] += 1
+                error_type = categorize_error(url_result.get("status_code"), url_result.get("error"))
+                self.error_types[error_type] = self.error_types.get(error_type, 0) + 1
+        self.batches += 1
+
+        now = time.monotonic()
+        self._samples.append((now, self.processed))
+        while len(self._samples) > 2 and self._samples[1][0] <= now - self.window:
+            self._samples.popleft()
+
+        if self.status_file and now - self._status_written >= self.status_interval:
+            self.write_status()
+
+    def rate(self) -> float:
+        """Скорость в URL-ах в секунду по скользящему окну"""
+        (first_time, first_count), (last_time, last_count) = self._samples[0], self._samples[-1]
+        if last_time <= first_time:
+            return 0.0
+        return (last_count - first_count) / (last_time - first_time)
+
+    @property
+    def remaining(self) -> int:
+        """URL-ы, ожидающие отправки (при потоковой отправке - только уже прочитанные)"""
+        return max(0, self.total - self.processed - self.skipped)
+
+    @property
+    def quota_remaining(self) -> Optional[int]:
+        """Остаток квоты (None - без ограничения)"""
+        return None if self.quota is None else max(0, self.quota - self.submitted)
+
+    def eta(self) -> Optional[float]:
+        """Секунд до конца отправки того, что помещается в квоту (None - неизвестно)"""
+        quota_remaining = self.quota_remaining
+        if self.total_known:
+            sendable = self.remaining if quota_remaining is None else min(self.remaining, quota_remaining)
+        elif self.read_fraction:
+            # Объем потока оцениваем по доле уже прочитанного файла
+            sendable = max(0, round(self.total / self.read_fraction) - self.processed - self.skipped)
+            if quota_remaining is not None:
+                sendable = min(sendable, quota_remaining)
+        elif quota_remaining is not None:
+            # Объем потока неизвестен - оцениваем время до исчерпания квоты
+            sendable = quota_remaining
+        else:
+            return None
+        if not sendable:
+            return 0.0
+        rate = self.rate()
+        return sendable / rate if rate > 0 else None
+
+    @property
+    def over_quota(self) -> int:
+        """URL-ы, которые не поместятся в оставшуюся квоту"""
+        quota_remaining = self.quota_remaining
+        if quota_remaining is None or not self.total_known:
+            return 0
+        return max(0, self.remaining - quota_remaining)
+
+    def finish(self):
+        """Завершение запуска (финальная запись файла состояния)"""
+        self.finished = time.monotonic()
+        if self.status_file:
+            self.write_status()
+
+    @property
+    def elapsed(self) -> float:
+        """Длительность запуска в секундах"""
+        return (self.finished or time.monotonic()) - self.started
+
+    def status(self) -> Dict:
+        """Машиночитаемое состояние"""
+        quota_remaining = self.quota_remaining
+        return {
+            "state": "finished" if self.finished else "running",
+            "started_at": self.started_at.isoformat(),
+            "updated_at": datetime.now().isoformat(),
+            "elapsed": round(self.elapsed, 3),
+            "total_urls": self.total,
+            "processed": self.processed,
+            "success_count": self.success_count,
+            "error_count": self.error_count,
+            "skipped": self.skipped,
+            "remaining": self.remaining,
+            "batches": self.batches,
+            "urls_per_sec": round(self.rate(), 2),
+            "eta_seconds": None if self.finished else self.eta(),
+            "quota_remaining": quota_remaining,
+            "over_quota": self.over_quota,
+            "error_types": self.error_types,
+            "domains": self.domains
+        }
+
+    def write_status(self):
+        """Запись файла состояния (через временный файл, чтобы читатель не увидел половину)"""
+        temp_path = f"{self.status_file}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.status(), f, ensure_ascii=False)
+        os.replace(temp_path, self.status_file)
+        self._status_written = time.monotonic()
+
+    def format_line(self) -> str:
+        """Строка прогресса для терминала"""
+        if self.total_known and self.total:
+            done = self.processed + self.skipped
+            line = f"{done}/{self.total} ({done / self.total:.0%})"
+        elif self.read_fraction:
+            line = f"обработано {self.processed} (прочитано {self.read_fraction:.0%} файла)"
+        else:
+            line = f"обработано {self.processed}"
+        line += f" | {self.rate():.1f} URL/с | ETA {format_duration(self.eta())}"
+        if self.over_quota:
+            line += f" (не помещается в квоту: {self.over_quota})"
+        return line
@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+"""
+Отчеты по истории запусков Google Indexing API Bulk Tool
+
+Результаты запусков (main.py пишет их после каждого пакета, старые
+indexing_results_*.json импортируются) индексируются в SQLite базу, по
+которой строятся отчеты:
+успешность по доменам во времени, постоянно падающие URL-ы и расход квоты.
+"""
+
+import glob
+import json
+import sqlite3
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from indexing_batch import categorize_error
+
+DEFAULT_HISTORY_DB = "indexing_history.db"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    run_key TEXT UNIQUE,
+    started_at TEXT,
+    day TEXT,
+    service_account TEXT,
+    total_urls INTEGER,
+    submitted INTEGER,
+    success_count INTEGER,
+    error_count INTEGER
+);
+CREATE TABLE IF NOT EXISTS url_results (
+    run_id INTEGER,
+    url TEXT,
+    domain TEXT,
+    day TEXT,
+    success INTEGER,
+    status_code INTEGER,
+    category TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_url_results_domain_day ON url_results (domain, day);
+CREATE INDEX IF NOT EXISTS idx_url_results_url ON url_results (url, success);
+CREATE INDEX IF NOT EXISTS idx_runs_account_day ON runs (service_account, day);
+"""
+
+
+class HistoryStore:
+    """SQLite база истории запусков"""
+
+    def __init__(self, path: str = DEFAULT_HISTORY_DB):
+        """
+        Args:
+            path: Путь к файлу базы
+        """
+        self.path = path
+        self._conn = sqlite3.connect(path)
+        self._conn.executescript(_SCHEMA)
+
+    def record_run(self, results: Dict) -> bool:
+        """
+        Запись результатов одного запуска
+
+        Args:
+            results: Результаты submit_urls
+
+        Returns:
+            False, если запуск уже был записан ранее
+        """
+        run = self.start_run(results)
+        if run is None:
+            return False
+        for batch in results.get("batches", []):
+            run.record(batch.get("url_results", []))
+        run.finish(results)
+        return True
+
+    def start_run(self, results: Dict) -> Optional["RunRecorder"]:
+        """
+        Начало записи запуска (результаты по URL-ам добавляются по мере отправки пакетов)
+
+        Args:
+            results: Результаты запуска (timestamp и service_account)
+
+        Returns:
+            Запись запуска или None, если запуск уже был записан ранее
+        """
+        started_at = results.get("timestamp") or datetime.now().isoformat()
+        service_account = results.get("service_account")
+        day = started_at[:10]
+
+        with self._conn:
+            cursor = self._conn.execute(
+                "INSERT OR IGNORE INTO runs"
+                " (run_key, started_at, day, service_account, total_urls, submitted, success_count, error_count)"
+                " VALUES (?, ?, ?, ?, 0, 0, 0, 0)",
+                (f"{service_account}|{started_at}", started_at, day, service_account)
+            )
+        if not cursor.rowcount:
+            return None
+        return RunRecorder(self._conn, cursor.lastrowid, day)
+
+    def import_files(self, paths: List[str]) -> Tuple[int, int]:
+        """
+        Импорт сохраненных JSON файлов с результатами
+
+        Args:
+            paths: Пути к файлам
+
+        Returns:
+            Кортеж (импортировано, пропущено)
+        """
+        imported = skipped = 0
+        for path in paths:
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    results = json.load(f)
+            except (OSError, ValueError):
+                skipped += 1
+                continue
+
+            # Старые файлы не содержат времени и аккаунта - берем время файла
+            if not results.get("timestamp"):
+                results["timestamp"] = datetime.fromtimestamp(Path(path).stat().st_mtime).isoformat()
+
+            if self.record_run(results):
+                imported += 1
+            else:
+                skipped += 1
+        return imported, skipped
+
+    def domain_success_rate(self, days: Optional[int] = None, domain: Optional[str] = None) -> List[Tuple]:
+        """
+        Успешность по доменам и дням
+
+        Returns:
+            Список (день, домен, всего, успешно)
+        """
+        query = "SELECT day, domain, COUNT(*), SUM(success) FROM url_results WHERE 1 = 1"
+        params = []
+        if days:
+            query += " AND day >= ?"
+            params.append(_since(days))
+        if domain:
+            query += " AND domain = ?"
+            params.append(domain)
+        query += " GROUP BY day, domain ORDER BY day, domain"
+        return self._conn.execute(query, params).fetchall()
+
+    def failing_urls(self, min_failures: int = 3, limit: int = 50) -> List[Tuple]:
+        """
+        URL-ы, которые падают повторно и с тех пор ни разу не были приняты
+
+        Returns:
+            Список (url, количество ошибок, последняя категория, последний день)
+        """
+        # Порядок запусков - по времени начала, а не по id: старые файлы
+        # могут быть импортированы после более новых запусков
+        return self._conn.execute(
+            "SELECT r.url, SUM(r.success = 0) AS failures,"
+            " (SELECT last.category FROM url_results AS last JOIN runs AS last_run ON last_run.id = last.run_id"
+            "  WHERE last.url = r.url AND last.success = 0"
+            "  ORDER BY last_run.started_at DESC LIMIT 1),"
+            " MAX(r.day)"
+            " FROM url_results AS r JOIN runs ON runs.id = r.run_id"
+            " GROUP BY r.url"
+            " HAVING failures >= ?"
+            "  AND COALESCE(MAX(CASE WHEN r.success = 1 THEN runs.started_at END), '')"
+            "      < MAX(CASE WHEN r.success = 0 THEN runs.started_at END)"
+            " ORDER BY failures DESC, url"
+            " LIMIT ?",
+            (min_failures, limit)
+        ).fetchall()
+
+    def quota_usage(self, days: Optional[int] = None) -> List[Tuple]:
+        """
+        Расход квоты по сервисным аккаунтам и дням
+
+        Returns:
+            Список (день, аккаунт, запусков, отправлено запросов)
+        """
+        query = "SELECT day, COALESCE(service_account, '-'), COUNT(*), SUM(submitted) FROM runs"
+        params = []
+        if days:
+            query += " WHERE day >= ?"
+            params.append(_since(days))
+        query += " GROUP BY day, service_account ORDER BY day, service_account"
+        return self._conn.execute(query, params).fetchall()
+
+    def close(self):
+        """Закрытие соединения с базой"""
+        self._conn.close()
+
+
+class RunRecorder:
+    """Запись одного запуска: результаты пакета пишутся сразу и в памяти не копятся"""
+
+    def __init__(self, conn: sqlite3.Connection, run_id: int, day: str):
+        self._conn = conn
+        self.run_id = run_id
+        self.day = day
+
+    def record(self, url_results: List[Dict]):
+        """
+        Запись результатов одного пакета
+
+        Args:
+            url_results: Результаты по URL-ам пакета
+        """
+        with self._conn:
+            self._conn.executemany(
+                "INSERT INTO url_results (run_id, url, domain, day, success, status_code, category, error)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    (
+                        self.run_id, url_result["url"], urlparse(url_result["url"]).netloc, self.day,
+                        1 if url_result["success"] else 0,
+                        url_result.get("status_code"),
+                        None if url_result["success"] else categorize_error(
+                            url_result.get("status_code"), url_result.get("error")
+                        ),
+                        url_result.get("error")
+                    )
+                    for url_result in url_results
+                )
+            )
+
+    def finish(self, results: Dict):
+        """
+        Итоговые счетчики запуска
+
+        Args:
+            results: Результаты запуска
+        """
+        # Старые файлы результатов не содержат submitted - считаем по пакетам
+        submitted = results.get("submitted")
+        if submitted is None:
+            submitted = sum(batch.get("urls_count", 0) for batch in results.get("batches", []))
+        with self._conn:
+            self._conn.execute(
+                "UPDATE runs SET total_urls = ?, submitted = ?, success_count = ?, error_count = ? WHERE id = ?",
+                (
+                    results.get("total_urls", 0), submitted,
+                    results.get("success_count", 0), results.get("error_count", 0),
+                    self.run_id
+                )
+            )
+
+
+def _since(days: int) -> str:
+    """Дата начала периода в формате YYYY-MM-DD"""
+    return (datetime.now() - timedelta(days=days)).strftime("%Y-%m-%d")
+
+
+def main():
+    """Главная функция"""
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Отчеты по истории запусков Google Indexing API Bulk Tool"
+    )
+
+    parser.add_argument(
+        '--history-db',
+        default=DEFAULT_HISTORY_DB,
+        help=f'Путь к базе истории (по умолчанию: {DEFAULT_HISTORY_DB})'
+    )
+
+    subparsers = parser.add_subparsers(dest='command')
+
+    import_parser = subparsers.add_parser('import', help='Импортировать сохраненные JSON результаты')
+    import_parser.add_argument('files', nargs='*', help='Файлы результатов (по умолчанию: indexing_results_*.json)')
+
+    domains_parser = subparsers.add_parser('domains', help='Успешность по доменам и дням')
+    domains_parser.add_argument('--days', type=int, help='За последние N дней')
+    domains_parser.add_argument('--domain', help='Только указанный домен')
+
+    failing_parser = subparsers.add_parser('failing', help='Постоянно падающие URL-ы')
+    failing_parser.add_argument('--min-failures', type=int, default=3, help='Минимум ошибок (по умолчанию: 3)')
+    failing_parser.add_argument('--limit', type=int, default=50, help='Максимум строк (по умолчанию: 50)')
+
+    quota_parser = subparsers.add_parser('quota', help='Расход квоты по аккаунтам')
+    quota_parser.add_argument('--days', type=int, help='За последние N дней')
+
+    args = parser.parse_args()
+
+    if not args.command:
+        parser.print_help()
+        return
+
+    try:
+        store = HistoryStore(args.history_db)
+
+        if args.command == 'import':
+            files = args.files or sorted(glob.glob("indexing_results_*.json"))
+            imported, skipped = store.import_files(files)
+            print(f"📥 Импортировано запусков: {imported}, пропущено: {skipped}")
+
+        elif args.command == 'domains':
+            rows = store.domain_success_rate(args.days, args.domain)
+            print("📊 Успешность по доменам:")
+            for day, domain, total, success in rows:
+                print(f"   {day}  {domain}: {success}/{total} ({success / total:.0%})")
+
+        elif args.command == 'failing':
+            rows = store.failing_urls(args.min_failures, args.limit)
+            print(f"❌ URL-ы с {args.min_failures}+ ошибками, не принятые после последней ошибки:")
+            for url, failures, category, last_day in rows:
+                print(f"   {url}: {failures} ошибок, последняя {last_day} ({category})")
+
+        elif args.command == 'quota':
+            rows = store.quota_usage(args.days)
+            print("📈 Расход квоты:")
+            for day, account, runs, submitted in rows:
+                print(f"   {day}  {account}: {submitted} запросов за {runs} запусков")
+
+        store.close()
+
+    except Exception as e:
+        print(f"❌ Ошибка: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
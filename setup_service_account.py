@@ -9,8 +9,7 @@ from pathlib import Path
 
 try:
     from google.cloud import iam_admin_v1
-    from google.oauth2 import service_account
-    from google.auth.transport.requests import Request
+    from credentials_provider import get_credentials
 except ImportError as e:
     print(f"Ошибка импорта: {e}")
     print("Установите зависимости: pip install google-cloud-iam")
@@ -62,11 +61,7 @@ def test_indexing_api_access(service_account_path: str = "service_account.json")
     print("\n🧪 Тестируем доступ к Indexing API...")
     
     try:
-        credentials = service_account.Credentials.from_service_account_file(
-            service_account_path,
-            scopes=['https://www.googleapis.com/auth/indexing']
-        )
-        credentials.refresh(Request())
+        credentials = get_credentials(service_account_path)
         
         print("✅ Аутентификация успешна")
         print(f"📧 Сервисный аккаунт: {credentials.service_account_email}")
@@ -0,0 +1,464 @@
+"""
+Источники URL-ов для Google Indexing API Bulk Tool
+
+Источник выдает пары (url, метаданные). Встроенные источники: текстовый файл
+(через mmap, с байтовыми смещениями для шардирования и продолжения), stdin,
+CSV и JSONL с метаданными по каждому URL-у (например etag, last_modified,
+content_hash для --only-changed), сжатые файлы .gz/.zst и курсор базы данных.
+
+Чтение идет в отдельном потоке через ограниченную очередь: быстрый источник
+ждет, пока отправка освободит место, а медленный не задерживает уже готовые
+URL-ы - неполный пакет отправляется по таймауту.
+"""
+
+import csv
+import gzip
+import io
+import itertools
+import json
+import mmap
+import operator
+import os
+import queue
+import sqlite3
+import sys
+import threading
+import time
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+UrlItem = Tuple[str, Dict]
+
+_SCHEMES = ('http://', 'https://')
+_WHITESPACE = (b' ', b'\t', b'\r', b'\x0b', b'\x0c')
+
+_END = object()
+
+
+def open_text(path: str):
+    """
+    Открытие текстового файла с распаковкой .gz и .zst
+
+    Args:
+        path: Путь к файлу
+    """
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8', newline='')
+    if path.endswith('.zst'):
+        if zstandard is None:
+            raise ImportError("Для .zst файлов установите зависимость: pip install zstandard")
+        stream = zstandard.ZstdDecompressor().stream_reader(open(path, 'rb'), closefd=True)
+        return io.TextIOWrapper(stream, encoding='utf-8', newline='')
+    return open(path, 'r', encoding='utf-8', newline='')
+
+
+class UrlSource(ABC):
+    """Базовый класс источника URL-ов"""
+
+    def __init__(self):
+        self.invalid_count = 0
+        self.invalid_samples = []
+
+    def __iter__(self) -> Iterator[UrlItem]:
+        for url, metadata in self._read():
+            url = url.strip()
+            if not url:
+                continue
+            if url.startswith(_SCHEMES):
+                yield url, metadata
+            else:
+                self._add_invalid(url)
+
+    def _add_invalid(self, value: str):
+        """Учет некорректной строки (первые 5 сохраняются как примеры)"""
+        self.invalid_count += 1
+        if len(self.invalid_samples) < 5:
+            self.invalid_samples.append(value)
+
+    @abstractmethod
+    def _read(self) -> Iterator[UrlItem]:
+        """Чтение сырых пар (url, метаданные)"""
+
+
+class TextFileSource(UrlSource):
+    """Текстовый файл, по одному URL-у на строку (используется для сжатых .gz и .zst)"""
+
+    def __init__(self, path: str):
+        super().__init__()
+        self.path = path
+
+    def _read(self) -> Iterator[UrlItem]:
+        with open_text(self.path) as f:
+            for line in f:
+                yield line, {}
+
+
+class MmapTextSource(UrlSource):
+    """
+    Несжатый текстовый файл через mmap
+
+    Файл разбирается окнами по несколько мегабайт: окно выравнивается по концу
+    строки и делится на строки одним вызовом split, без поиска каждой строки
+    из Python. Поддерживаются байтовые смещения: start/end задают диапазон для
+    шардирования (строка принадлежит диапазону, если начинается в нем), а offset
+    после каждого URL-а позволяет продолжить с места остановки.
+    """
+
+    chunk_size = 8 * 1024 * 1024
+
+    def __init__(self, path: str, start: int = 0, end: Optional[int] = None, track_offsets: bool = True):
+        """
+        Args:
+            path: Путь к файлу
+            start: Байтовое смещение начала диапазона
+            end: Байтовое смещение конца диапазона (None - до конца файла)
+            track_offsets: Добавлять в метаданные смещение следующей строки ("offset")
+        """
+        super().__init__()
+        self.path = path
+        self.start = start
+        self.end = end
+        self.track_offsets = track_offsets
+        self.offset = start
+        self.size = None
+
+    def __iter__(self) -> Iterator[UrlItem]:
+        return self._read()
+
+    def fraction(self, offset: int) -> Optional[float]:
+        """Доля диапазона, прочитанная до смещения offset (None - файл еще не открыт)"""
+        if not self.size:
+            return None
+        stop = self.size if self.end is None else min(self.end, self.size)
+        if stop <= self.start:
+            return 1.0
+        return min(1.0, max(0, offset - self.start) / (stop - self.start))
+
+    def _read(self) -> Iterator[UrlItem]:
+        with open(self.path, 'rb') as f:
+            size = self.size = os.fstat(f.fileno()).st_size
+            if size == 0 or self.start >= size:
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                pos = self.start
+
+                # Начало посреди строки: она принадлежит предыдущему диапазону
+                if pos > 0 and mm[pos - 1] != 0x0A:
+                    newline = mm.find(b'\n', pos)
+                    pos = size if newline == -1 else newline + 1
+
+                # Конец диапазона: до конца строки, которая начинается перед end
+                stop = size
+                if self.end is not None and self.end < size:
+                    newline = mm.find(b'\n', max(self.end - 1, 0))
+                    stop = size if newline == -1 else newline + 1
+
+                while pos < stop:
+                    chunk_end = min(pos + self.chunk_size, stop)
+                    if chunk_end < stop:
+                        newline = mm.rfind(b'\n', pos, chunk_end)
+                        if newline == -1:
+                            # Строка длиннее окна
+                            newline = mm.find(b'\n', chunk_end)
+                        chunk_end = stop if newline == -1 else min(newline + 1, stop)
+
+                    yield from self._split(mm[pos:chunk_end], pos)
+                    pos = self.offset = chunk_end
+
+    def _split(self, chunk: bytes, pos: int) -> Iterator[UrlItem]:
+        """
+        Разбор окна на URL-ы (возвращает итератор, а не генератор: на каждый URL
+        не добавляется лишний уровень yield)
+
+        Args:
+            chunk: Окно из целых строк
+            pos: Смещение начала окна в файле
+        """
+        # Декодирование не создает и не удаляет символы перевода строки,
+        # поэтому строки текста совпадают по номерам со строками байтов
+        text = chunk.decode('utf-8', 'replace')
+        lines = text.split('\n')
+        ascii_only = chunk.isascii()
+
+        offsets = None
+        if self.track_offsets:
+            # Смещение после строки i: длины строк 0..i плюс i + 1 перевод строки
+            lengths = map(len, lines) if ascii_only else map(len, chunk.split(b'\n'))
+            offsets = list(map(operator.add, itertools.accumulate(lengths), itertools.count(pos + 1)))
+            # Последняя строка файла может быть без перевода строки
+            offsets[-1] = min(offsets[-1], self.size)
+
+        # Пробелы по краям строк (в том числе \r из CRLF) встречаются редко:
+        # строки очищаются, только если в окне есть пробельные символы
+        if not ascii_only or any(char in chunk for char in _WHITESPACE):
+            lines = [line.strip() for line in lines]
+
+        # Перевод строки в конце окна дает пустой последний элемент
+        if lines and not lines[-1]:
+            lines.pop()
+
+        valid = None
+        if not _same_scheme(lines):
+            valid = list(map(str.startswith, lines, itertools.repeat(_SCHEMES)))
+            if valid.count(False) > lines.count(''):
+                for line, is_valid in zip(lines, valid):
+                    if line and not is_valid:
+                        self._add_invalid(line)
+
+        urls = lines if valid is None else itertools.compress(lines, valid)
+        if offsets is None:
+            return zip(urls, itertools.repeat({}))
+        if valid is not None:
+            offsets = itertools.compress(offsets, valid)
+        return zip(urls, map(dict.fromkeys, itertools.repeat(("offset",)), offsets))
+
+
+def _same_scheme(lines: List[str]) -> bool:
+    """
+    Все ли строки начинаются с одной схемы
+
+    Строки с префиксом 'http://' - это ровно строки в диапазоне ['http://', 'http:/0'),
+    поэтому вместо проверки каждой строки достаточно сравнить минимум и максимум.
+    """
+    if not lines or '' in lines:
+        return False
+    low, high = min(lines), max(lines)
+    return any(scheme <= low and high < scheme[:-1] + '0' for scheme in _SCHEMES)
+
+
+def shard_range(path: str, shard: int, shards: int) -> Tuple[int, int]:
+    """
+    Байтовый диапазон шарда файла (границы выравниваются по строкам при чтении)
+
+    Args:
+        path: Путь к файлу
+        shard: Номер шарда, начиная с 1
+        shards: Количество шардов
+
+    Returns:
+        Кортеж (start, end)
+    """
+    if not 1 <= shard <= shards:
+        raise ValueError(f"Некорректный шард {shard}/{shards}")
+    size = os.path.getsize(path)
+    return size * (shard - 1) // shards, size * shard // shards
+
+
+class StdinSource(UrlSource):
+    """Стандартный ввод, по одному URL-у на строку"""
+
+    def _read(self) -> Iterator[UrlItem]:
+        for line in sys.stdin:
+            yield line, {}
+
+
+class CsvSource(UrlSource):
+    """CSV файл с заголовком; остальные колонки становятся метаданными"""
+
+    def __init__(self, path: str, url_field: str = 'url'):
+        super().__init__()
+        self.path = path
+        self.url_field = url_field
+
+    def _read(self) -> Iterator[UrlItem]:
+        with open_text(self.path) as f:
+            for row in csv.DictReader(f):
+                url = row.pop(self.url_field, None) or ''
+                yield url, {key: value for key, value in row.items() if value}
+
+
+class JsonlSource(UrlSource):
+    """JSON lines: по объекту на строку с полем url и метаданными"""
+
+    def __init__(self, path: str, url_field: str = 'url'):
+        super().__init__()
+        self.path = path
+        self.url_field = url_field
+
+    def _read(self) -> Iterator[UrlItem]:
+        with open_text(self.path) as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    self._add_invalid(line.strip())
+                    continue
+                url = record.pop(self.url_field, None) if isinstance(record, dict) else None
+                yield str(url or ''), record if isinstance(record, dict) else {}
+
+
+class DatabaseSource(UrlSource):
+    """Результат SQL запроса через курсор DB-API; первая колонка - URL"""
+
+    def __init__(self, connection, query: str, params: tuple = (), fetch_size: int = 1000):
+        """
+        Args:
+            connection: Соединение DB-API (sqlite3, psycopg2, ...)
+            query: SQL запрос, первая колонка которого - URL
+            params: Параметры запроса
+            fetch_size: Количество строк, забираемых за раз
+        """
+        super().__init__()
+        self.connection = connection
+        self.query = query
+        self.params = params
+        self.fetch_size = fetch_size
+
+    def _read(self) -> Iterator[UrlItem]:
+        cursor = self.connection.cursor()
+        try:
+            cursor.execute(self.query, self.params)
+            columns = [column[0] for column in cursor.description]
+            while True:
+                rows = cursor.fetchmany(self.fetch_size)
+                if not rows:
+                    break
+                for row in rows:
+                    metadata = {
+                        column: value for column, value in zip(columns[1:], row[1:]) if value is not None
+                    }
+                    yield str(row[0] or ''), metadata
+        finally:
+            cursor.close()
+
+
+def create_source(spec: str, source_type: str = 'auto', query: Optional[str] = None,
+                  start: int = 0, end: Optional[int] = None) -> UrlSource:
+    """
+    Создание источника по пути и типу
+
+    Args:
+        spec: Путь к файлу, '-' для stdin или sqlite:///path.db для базы
+        source_type: auto, text, csv, jsonl или db
+        query: SQL запрос для источника db
+        start: Байтовое смещение начала (только несжатый текстовый файл)
+        end: Байтовое смещение конца (только несжатый текстовый файл)
+
+    Returns:
+        Источник URL-ов
+    """
+    if source_type == 'auto':
+        name = spec[:-len(Path(spec).suffix)] if spec.endswith(('.gz', '.zst')) else spec
+        if spec == '-':
+            source_type = 'stdin'
+        elif spec.startswith('sqlite:///'):
+            source_type = 'db'
+        elif name.endswith('.csv'):
+            source_type = 'csv'
+        elif name.endswith(('.jsonl', '.ndjson')):
+            source_type = 'jsonl'
+        else:
+            source_type = 'text'
+
+    if source_type == 'stdin' or spec == '-':
+        return StdinSource()
+    if source_type == 'csv':
+        return CsvSource(spec)
+    if source_type == 'jsonl':
+        return JsonlSource(spec)
+    if source_type == 'db':
+        if not query:
+            raise ValueError("Для источника db укажите SQL запрос (--query)")
+        path = spec[len('sqlite:///'):] if spec.startswith('sqlite:///') else spec
+        return DatabaseSource(sqlite3.connect(path, check_same_thread=False), query)
+    if spec.endswith(('.gz', '.zst')):
+        if start or end is not None:
+            raise ValueError("Смещения поддерживаются только для несжатых текстовых файлов")
+        return TextFileSource(spec)
+    return MmapTextSource(spec, start, end)
+
+
+class SourceReader:
+    """Чтение источника в отдельном потоке в ограниченную очередь"""
+
+    def __init__(self, source: UrlSource, maxsize: int = 10000):
+        """
+        Args:
+            source: Источник URL-ов
+            maxsize: Максимум URL-ов в очереди (ограничивает память)
+        """
+        self.source = source
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.error = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="url-source-reader", daemon=True)
+        self._thread.start()
+
+    def _put(self, item) -> bool:
+        """Блокирующая запись в очередь с проверкой остановки"""
+        while not self._stop.is_set():
+            try:
+                self.queue.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _run(self):
+        try:
+            for item in self.source:
+                if not self._put(item):
+                    return
+        except Exception as e:
+            self.error = e
+        self._put(_END)
+
+    def close(self):
+        """Остановка чтения"""
+        self._stop.set()
+
+    def iter_batches(self, size_fn: Callable[[], int], flush_timeout: float = 1.0) -> Iterator[List[UrlItem]]:
+        """
+        Сборка пакетов из очереди
+
+        Args:
+            size_fn: Функция, возвращающая размер следующего пакета (0 - остановиться)
+            flush_timeout: Через сколько секунд после первого URL-а пакета отправлять его неполным
+
+        Yields:
+            Пакет пар (url, метаданные)
+        """
+        batch = []
+        deadline = None
+        try:
+            while True:
+                size = size_fn()
+                if size <= 0:
+                    return
+                try:
+                    # Таймаут отсчитывается от первого URL-а пакета, а не от последнего
+                    if batch:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            raise queue.Empty
+                        item = self.queue.get(timeout=remaining)
+                    else:
+                        item = self.queue.get()
+                except queue.Empty:
+                    yield batch
+                    batch = []
+                    continue
+
+                if item is _END:
+                    break
+                if not batch:
+                    deadline = time.monotonic() + flush_timeout
+                batch.append(item)
+                if len(batch) >= size:
+                    yield batch
+                    batch = []
+
+            if batch:
+                yield batch
+            if self.error:
+                raise self.error
+        finally:
+            self.close()